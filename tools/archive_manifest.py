@@ -0,0 +1,525 @@
+"""
+Per-archive content listings for the .zip, .rar and .7z items of the filesystem tree.
+
+Only archive metadata is read: the zip central directory, the RAR block headers (data is
+skipped with seeks) and the 7z end header, decoded with the stdlib lzma module when it is
+compressed. The one exception is .jsdos/dosbox.conf, which is extracted from executable zips
+to summarize the emulator settings and the autoexec section.
+
+Listings are written to filesystem.archives/<archive path>.json next to the output:
+
+  {"format", "files", "size", "compressedSize",
+   "entries": [[name, size, compressed size or null], ...],
+   "dosbox": {"machine", "memsize", "cycles", "core", "cputype", "sbtype", "autoexec": [...], "runs": bool}}
+
+"dosbox" is only present for zips with a .jsdos/dosbox.conf. Unreadable archives get
+{"format", "error"} instead of the entry list.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import lzma
+import re
+import struct
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes, write_text_if_changed
+
+
+ARCHIVE_DIR_NAME = "filesystem.archives"
+MAX_7Z_HEADER = 16 * 1024 * 1024
+DOSBOX_CONF = ".jsdos/dosbox.conf"
+DOSBOX_KEYS = {"machine", "memsize", "cycles", "core", "cputype", "sbtype"}
+# Autoexec commands that only prepare the environment; anything else starts a program.
+DOSBOX_SETUP_COMMANDS = {"mount", "imgmount", "echo", "@echo", "cls", "rem", "pause", "cd", "set", "path", "exit"}
+DRIVE_RE = re.compile(r"^[a-z]:\\?$", re.IGNORECASE)
+
+Entry = List[Any]
+
+
+class ArchiveError(Exception):
+    """The archive cannot be listed without extracting it (damaged or encrypted headers)."""
+
+
+def summarize_dosbox_conf(text: str) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    autoexec: List[str] = []
+    section = ""
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if section == "autoexec":
+            if line.startswith("[") and line.endswith("]"):
+                section = line[1:-1].strip().lower()
+            elif line and not line.startswith("#"):
+                autoexec.append(line)
+            continue
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            section = line[1:-1].strip().lower()
+        elif "=" in line:
+            key, value = (part.strip() for part in line.split("=", 1))
+            if key.lower() in DOSBOX_KEYS:
+                summary[key.lower()] = value
+    summary["autoexec"] = autoexec
+    summary["runs"] = any(
+        line.split()[0].lower() not in DOSBOX_SETUP_COMMANDS and not DRIVE_RE.match(line) for line in autoexec
+    )
+    return summary
+
+
+def list_zip(path: Path) -> Tuple[List[Entry], Optional[Dict[str, Any]]]:
+    try:
+        with zipfile.ZipFile(path) as zf:
+            infos = zf.infolist()
+            entries = [[info.filename, info.file_size, info.compress_size] for info in infos if not info.is_dir()]
+            dosbox = None
+            for info in infos:
+                if info.filename.lower() == DOSBOX_CONF:
+                    dosbox = summarize_dosbox_conf(zf.read(info).decode("utf-8", errors="replace"))
+                    break
+    except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as exc:
+        raise ArchiveError(str(exc)) from exc
+    return entries, dosbox
+
+
+def decode_rar_unicode(name: bytes) -> str:
+    """Decode a RAR 2.x/3.x LHD_UNICODE file name (ASCII name, zero byte, compressed UTF-16)."""
+    null = name.find(b"\x00")
+    if null < 0:
+        return name.decode("utf-8", errors="replace")
+    std, enc = name[:null], name[null + 1:]
+    out: List[int] = []
+    try:
+        high = enc[0]
+        pos = 1
+        flags = flag_bits = 0
+        while pos < len(enc):
+            if flag_bits == 0:
+                flags = enc[pos]
+                pos += 1
+                flag_bits = 8
+            flag_bits -= 2
+            kind = (flags >> flag_bits) & 3
+            if kind == 0:
+                out.append(enc[pos])
+                pos += 1
+            elif kind == 1:
+                out.append(enc[pos] | (high << 8))
+                pos += 1
+            elif kind == 2:
+                out.append(enc[pos] | (enc[pos + 1] << 8))
+                pos += 2
+            else:
+                length = enc[pos]
+                pos += 1
+                if length & 0x80:
+                    correction = enc[pos]
+                    pos += 1
+                    for _ in range((length & 0x7F) + 2):
+                        out.append(((std[len(out)] + correction) & 0xFF) | (high << 8))
+                else:
+                    for _ in range(length + 2):
+                        out.append(std[len(out)])
+    except IndexError:
+        pass
+    return "".join(map(chr, out)) or std.decode("cp866", errors="replace")
+
+
+def read_vint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def list_rar4(f: BinaryIO) -> List[Entry]:
+    entries: List[Entry] = []
+    pos = 7
+    while True:
+        f.seek(pos)
+        head = f.read(7)
+        if len(head) < 7:
+            return entries
+        _, head_type, flags, head_size = struct.unpack("<HBHH", head)
+        if head_size < 7:
+            raise ArchiveError("damaged block header")
+        if head_type == 0x73 and flags & 0x0080:
+            raise ArchiveError("encrypted headers")
+        if head_type == 0x7B:
+            return entries
+        add_size = struct.unpack("<I", f.read(4))[0] if flags & 0x8000 else 0
+        if head_type == 0x74:
+            f.seek(pos + 7)
+            body = f.read(head_size - 7)
+            pack_size, unp_size = struct.unpack("<II", body[0:8])
+            name_size = struct.unpack("<H", body[19:21])[0]
+            name_start = 25
+            if flags & 0x0100:
+                high_pack, high_unp = struct.unpack("<II", body[25:33])
+                pack_size |= high_pack << 32
+                unp_size |= high_unp << 32
+                name_start = 33
+            raw_name = body[name_start:name_start + name_size]
+            name = decode_rar_unicode(raw_name) if flags & 0x0200 else raw_name.decode("cp866", errors="replace")
+            if flags & 0x00E0 != 0x00E0:
+                entries.append([name.replace("\\", "/"), unp_size, pack_size])
+            add_size = pack_size
+        pos += head_size + add_size
+
+
+def list_rar5(f: BinaryIO) -> List[Entry]:
+    entries: List[Entry] = []
+    pos = 8
+    while True:
+        f.seek(pos)
+        prefix = f.read(4 + 3)
+        if len(prefix) < 5:
+            return entries
+        header_size, data_start = read_vint(prefix, 4)
+        f.seek(pos + data_start)
+        header = f.read(header_size)
+        head_type, p = read_vint(header, 0)
+        flags, p = read_vint(header, p)
+        data_size = 0
+        if flags & 0x01:
+            _, p = read_vint(header, p)  # extra area size
+        if flags & 0x02:
+            data_size, p = read_vint(header, p)
+        if head_type == 4:
+            raise ArchiveError("encrypted headers")
+        if head_type == 5:
+            return entries
+        if head_type == 2:
+            file_flags, p = read_vint(header, p)
+            unp_size, p = read_vint(header, p)
+            _, p = read_vint(header, p)  # attributes
+            p += (4 if file_flags & 0x02 else 0) + (4 if file_flags & 0x04 else 0)
+            _, p = read_vint(header, p)  # compression info
+            _, p = read_vint(header, p)  # host OS
+            name_size, p = read_vint(header, p)
+            name = header[p:p + name_size].decode("utf-8", errors="replace")
+            if not file_flags & 0x01:
+                entries.append([name, None if file_flags & 0x08 else unp_size, data_size])
+        pos += data_start + header_size + data_size
+
+
+class SevenZipReader:
+    """Cursor over a 7z header with the format's variable-length numbers."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def byte(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def read(self, size: int) -> bytes:
+        value = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return value
+
+    def number(self) -> int:
+        first = self.byte()
+        mask = 0x80
+        value = 0
+        for idx in range(8):
+            if not first & mask:
+                return value | ((first & (mask - 1)) << (8 * idx))
+            value |= self.byte() << (8 * idx)
+            mask >>= 1
+        return value
+
+    def bits(self, count: int) -> List[bool]:
+        result = []
+        mask = byte = 0
+        for _ in range(count):
+            if not mask:
+                byte = self.byte()
+                mask = 0x80
+            result.append(bool(byte & mask))
+            mask >>= 1
+        return result
+
+    def defined_bits(self, count: int) -> List[bool]:
+        all_defined = self.byte()
+        return [True] * count if all_defined else self.bits(count)
+
+    def skip_digests(self, count: int) -> List[bool]:
+        defined = self.defined_bits(count)
+        self.pos += 4 * sum(defined)
+        return defined
+
+
+def read_7z_streams(r: SevenZipReader) -> Dict[str, Any]:
+    """PackInfo, UnpackInfo and SubStreamsInfo of a 7z StreamsInfo block."""
+    info: Dict[str, Any] = {"pack_pos": 0, "pack_sizes": [], "folders": [], "folder_crcs": [], "substreams": None}
+    while True:
+        prop = r.byte()
+        if prop == 0x00:
+            return info
+        if prop == 0x06:
+            info["pack_pos"] = r.number()
+            count = r.number()
+            while True:
+                sub = r.byte()
+                if sub == 0x00:
+                    break
+                if sub == 0x09:
+                    info["pack_sizes"] = [r.number() for _ in range(count)]
+                elif sub == 0x0A:
+                    r.skip_digests(count)
+        elif prop == 0x07:
+            if r.byte() != 0x0B:
+                raise ArchiveError("unexpected 7z unpack info")
+            count = r.number()
+            if r.byte() != 0:
+                raise ArchiveError("external 7z folders")
+            for _ in range(count):
+                coders = []
+                total_in = total_out = 0
+                for _ in range(r.number()):
+                    flag = r.byte()
+                    coder_id = r.read(flag & 0x0F)
+                    num_in, num_out = (r.number(), r.number()) if flag & 0x10 else (1, 1)
+                    props = r.read(r.number()) if flag & 0x20 else b""
+                    coders.append((coder_id, props))
+                    total_in += num_in
+                    total_out += num_out
+                bound_out = set()
+                for _ in range(total_out - 1):
+                    r.number()
+                    bound_out.add(r.number())
+                if total_in - (total_out - 1) > 1:
+                    for _ in range(total_in - (total_out - 1)):
+                        r.number()
+                info["folders"].append({"coders": coders, "outs": total_out, "bound": bound_out})
+            if r.byte() != 0x0C:
+                raise ArchiveError("missing 7z unpack sizes")
+            for folder in info["folders"]:
+                sizes = [r.number() for _ in range(folder["outs"])]
+                folder["size"] = next(size for idx, size in enumerate(sizes) if idx not in folder["bound"])
+            while True:
+                sub = r.byte()
+                if sub == 0x00:
+                    break
+                if sub == 0x0A:
+                    info["folder_crcs"] = r.skip_digests(len(info["folders"]))
+        elif prop == 0x08:
+            folders = info["folders"]
+            counts = [1] * len(folders)
+            sizes: List[int] = []
+            sub = r.byte()
+            if sub == 0x0D:
+                counts = [r.number() for _ in folders]
+                sub = r.byte()
+            if sub == 0x09:
+                for folder, count in zip(folders, counts):
+                    if count:
+                        parts = [r.number() for _ in range(count - 1)]
+                        sizes.extend(parts + [folder["size"] - sum(parts)])
+                sub = r.byte()
+            else:
+                for folder, count in zip(folders, counts):
+                    if count == 1:
+                        sizes.append(folder["size"])
+            while sub != 0x00:
+                if sub == 0x0A:
+                    # Streams that are a whole folder with a known CRC have no digest of their own.
+                    crcs = info["folder_crcs"] or [False] * len(folders)
+                    r.skip_digests(sum(0 if count == 1 and crc else count for count, crc in zip(counts, crcs)))
+                sub = r.byte()
+            info["substreams"] = (counts, sizes)
+        else:
+            raise ArchiveError(f"unexpected 7z property {prop}")
+
+
+def decode_7z_folder(f: BinaryIO, info: Dict[str, Any]) -> bytes:
+    """Decompress the single-coder LZMA/LZMA2 folder that holds an encoded 7z header."""
+    folder = info["folders"][0]
+    if len(folder["coders"]) != 1:
+        raise ArchiveError("unsupported 7z header coders")
+    coder_id, props = folder["coders"][0]
+    if coder_id == b"\x03\x01\x01":
+        d = props[0]
+        filters = [{
+            "id": lzma.FILTER_LZMA1, "lc": d % 9, "lp": (d // 9) % 5, "pb": d // 45,
+            "dict_size": struct.unpack("<I", props[1:5])[0],
+        }]
+    elif coder_id == b"\x21":
+        filters = [{"id": lzma.FILTER_LZMA2, "dict_size": lzma_dict_size(props[0])}]
+    elif coder_id == b"\x00":
+        filters = None
+    else:
+        raise ArchiveError("encrypted or unsupported 7z header")
+    f.seek(32 + info["pack_pos"])
+    packed = f.read(info["pack_sizes"][0])
+    if filters is None:
+        return packed
+    return lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=filters).decompress(packed, folder["size"])
+
+
+def lzma_dict_size(prop: int) -> int:
+    if prop >= 40:
+        return 0xFFFFFFFF
+    return (2 | (prop & 1)) << (prop // 2 + 11)
+
+
+def list_7z(f: BinaryIO) -> List[Entry]:
+    start = f.read(32)
+    offset, size = struct.unpack("<QQ", start[12:28])
+    if size > MAX_7Z_HEADER:
+        raise ArchiveError("7z header too large")
+    f.seek(32 + offset)
+    r = SevenZipReader(f.read(size))
+    if not r.data:
+        return []
+    marker = r.byte()
+    if marker == 0x17:
+        r = SevenZipReader(decode_7z_folder(f, read_7z_streams(r)))
+        marker = r.byte()
+    if marker != 0x01:
+        raise ArchiveError("unexpected 7z header")
+
+    streams: Dict[str, Any] = {"pack_sizes": [], "folders": [], "substreams": None}
+    prop = r.byte()
+    if prop == 0x02:
+        raise ArchiveError("7z archive properties are not supported")
+    if prop == 0x03:
+        read_7z_streams(r)
+        prop = r.byte()
+    if prop == 0x04:
+        streams = read_7z_streams(r)
+        prop = r.byte()
+    if prop != 0x05:
+        return []
+
+    num_files = r.number()
+    empty_stream = [False] * num_files
+    empty_file: List[bool] = []
+    names: List[str] = [""] * num_files
+    while True:
+        kind = r.byte()
+        if kind == 0x00:
+            break
+        prop_size = r.number()
+        end = r.pos + prop_size
+        if kind == 0x0E:
+            empty_stream = r.bits(num_files)
+        elif kind == 0x0F:
+            empty_file = r.bits(sum(empty_stream))
+        elif kind == 0x11:
+            r.byte()
+            names = r.read(prop_size - 1).decode("utf-16-le").split("\x00")[:num_files]
+        r.pos = end
+
+    counts, sizes = streams["substreams"] or ([1] * len(streams["folders"]), [fo["size"] for fo in streams["folders"]])
+    # A folder holding exactly one file gives that file an exact compressed size.
+    packed_by_stream: List[Optional[int]] = []
+    for idx, count in enumerate(counts):
+        packed = streams["pack_sizes"][idx] if count == 1 and idx < len(streams["pack_sizes"]) else None
+        packed_by_stream.extend([packed] * count)
+
+    entries: List[Entry] = []
+    stream_idx = empty_idx = 0
+    for idx in range(num_files):
+        if empty_stream[idx]:
+            is_file = empty_idx < len(empty_file) and empty_file[empty_idx]
+            empty_idx += 1
+            if is_file:
+                entries.append([names[idx], 0, 0])
+            continue
+        entries.append([names[idx], sizes[stream_idx], packed_by_stream[stream_idx]])
+        stream_idx += 1
+    return entries
+
+
+def list_archive(path: Path) -> Dict[str, Any]:
+    """Listing of one archive, based on its signature rather than its extension."""
+    with path.open("rb") as f:
+        signature = f.read(8)
+        f.seek(0)
+        try:
+            if signature.startswith(b"PK"):
+                fmt = "zip"
+                entries, dosbox = list_zip(path)
+            elif signature[:7] == b"Rar!\x1a\x07\x00":
+                fmt, dosbox = "rar", None
+                entries = list_rar4(f)
+            elif signature == b"Rar!\x1a\x07\x01\x00":
+                fmt, dosbox = "rar", None
+                entries = list_rar5(f)
+            elif signature[:6] == b"7z\xbc\xaf\x27\x1c":
+                fmt, dosbox = "7z", None
+                entries = list_7z(f)
+            else:
+                return {"format": path.suffix.lower().lstrip("."), "error": "unknown archive format"}
+        except ArchiveError as exc:
+            return {"format": path.suffix.lower().lstrip("."), "error": str(exc)}
+        except (struct.error, IndexError, ValueError, LookupError, lzma.LZMAError) as exc:
+            return {"format": path.suffix.lower().lstrip("."), "error": f"damaged archive: {exc}"}
+
+    listing: Dict[str, Any] = {
+        "format": fmt,
+        "files": len(entries),
+        "size": sum(entry[1] or 0 for entry in entries),
+        "compressedSize": path.stat().st_size,
+        "entries": entries,
+    }
+    if dosbox is not None:
+        listing["dosbox"] = dosbox
+    return listing
+
+
+def sidecar_path(rel_path: str) -> str:
+    return f"{ARCHIVE_DIR_NAME}/{rel_path}.json"
+
+
+def build_archive_manifests(data: Dict[str, Any], root: Path, out_dir: Path, cache_path: Path) -> Tuple[int, int]:
+    """
+    Write a listing for every archive and executable item and link it as "contents".
+
+    Listings are cached by mtime and size; sidecars are only rewritten when they change and
+    sidecars of removed archives are deleted. Returns (archives listed, archives read).
+    """
+    cache = FileCache(cache_path, version=hashlib.sha1(Path(__file__).read_bytes()).hexdigest())
+    listings: Dict[str, Dict[str, Any]] = {}
+    read = 0
+    for node in iter_nodes(data):
+        if node["type"] not in ("archive", "executable"):
+            continue
+        rel_path = node["path"]
+        if rel_path not in listings:
+            path = root / rel_path
+            st = path.stat()
+            listing = cache.lookup(rel_path, st)
+            if listing is None:
+                listing = list_archive(path)
+                cache.store(rel_path, st, listing)
+                read += 1
+            listings[rel_path] = listing
+            write_text_if_changed(
+                out_dir.parent / sidecar_path(rel_path),
+                json.dumps(listing, ensure_ascii=False, separators=(",", ":")),
+            )
+        node["contents"] = sidecar_path(rel_path)
+
+    keep = {f"{rel_path}.json" for rel_path in listings}
+    for path in sorted(out_dir.rglob("*.json"), reverse=True):
+        if path.relative_to(out_dir).as_posix() not in keep:
+            path.unlink()
+    for path in sorted(out_dir.rglob("*"), reverse=True):
+        if path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    cache.save()
+    return len(listings), read
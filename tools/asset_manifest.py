@@ -0,0 +1,127 @@
+"""
+Ordered asset lists of WordPad (.md) and HTML documents, for preloading.
+
+Markdown is rendered with the markdown_render port of the WordPad renderer, so targets resolve
+exactly as in the browser; HTML pages are parsed as they are. Local targets under /filesystem/
+are listed in document order with their sizes on the document's node: images, scripts and
+stylesheets count towards "assetBytes", plain links to local files are listed but not counted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from fs_util import FileCache, iter_nodes
+from markdown_render import base_path_for, markdown_to_html
+
+
+FILESYSTEM_URL = "/filesystem/"
+# (tag, attribute) -> asset kind; "link" targets are listed but not counted as page weight.
+ASSET_ATTRS = {
+    ("img", "src"): "image",
+    ("script", "src"): "script",
+    ("a", "href"): "link",
+}
+
+
+class AssetParser(HTMLParser):
+    """Collect (url, kind) of asset references in document order."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.refs: List[Tuple[str, str]] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        values = {name: value for name, value in attrs if value}
+        if tag == "link" and "stylesheet" in (values.get("rel") or "").lower().split() and "href" in values:
+            self.refs.append((values["href"], "style"))
+            return
+        for (asset_tag, attr), kind in ASSET_ATTRS.items():
+            if tag == asset_tag and attr in values:
+                self.refs.append((values[attr], kind))
+
+
+def local_target(url: str, page_url: str) -> Optional[str]:
+    """Path below /filesystem/ that url points to from page_url, or None if it leaves it."""
+    parts = urlsplit(urljoin(page_url, url.strip()))
+    if parts.scheme or parts.netloc or not parts.path.startswith(FILESYSTEM_URL):
+        return None
+    rel_path = unquote(parts.path[len(FILESYSTEM_URL):])
+    return rel_path or None
+
+
+def document_refs(source: Path, rel_path: str, is_markdown: bool, raw: Optional[bytes] = None) -> List[Tuple[str, str]]:
+    """Local (path, kind) targets of one document, first occurrence of each path only; raw overrides its bytes."""
+    if raw is None:
+        raw = source.read_bytes()
+    if is_markdown:
+        html = markdown_to_html(raw.decode("utf-8-sig", errors="replace"), base_path_for(rel_path))
+    else:
+        html = raw.decode("utf-8", errors="replace")
+    parser = AssetParser()
+    parser.feed(html)
+    parser.close()
+    page_url = f"{FILESYSTEM_URL}{rel_path}"
+    refs: List[Tuple[str, str]] = []
+    seen = set()
+    for url, kind in parser.refs:
+        target = local_target(url, page_url)
+        if target is not None and target != rel_path and target not in seen:
+            seen.add(target)
+            refs.append((target, kind))
+    return refs
+
+
+def document_ref_lists(data: Dict[str, Any], root: Path, cache_path: Path) -> Tuple[Dict[str, List[Tuple[str, str]]], int]:
+    """
+    document_refs() of every wordpad and html item, cached by the document's mtime and size.
+
+    Returns ({document path: [(target, kind), ...]}, documents parsed).
+    """
+    version = hashlib.sha1(
+        Path(__file__).read_bytes() + (Path(__file__).parent / "markdown_render.py").read_bytes()
+    ).hexdigest()
+    cache = FileCache(cache_path, version=version)
+    ref_lists: Dict[str, List[Tuple[str, str]]] = {}
+    parsed = 0
+    for node in iter_nodes(data):
+        rel_path = node["path"]
+        if node["type"] not in ("wordpad", "html") or rel_path in ref_lists:
+            continue
+        source = root / rel_path
+        st = source.stat()
+        refs = cache.lookup(rel_path, st)
+        if refs is None:
+            refs = document_refs(source, rel_path, node["type"] == "wordpad")
+            cache.store(rel_path, st, refs)
+            parsed += 1
+        ref_lists[rel_path] = [(target, kind) for target, kind in refs]
+    cache.save()
+    return ref_lists, parsed
+
+
+def build_asset_manifests(data: Dict[str, Any], root: Path, cache_path: Path) -> Tuple[int, int]:
+    """
+    Add "assets" ([{"path", "size", "kind"}] in document order) and "assetBytes" to documents.
+
+    Target sizes are stat'ed on every run and targets that do not exist are left out.
+    Returns (documents with assets, documents parsed).
+    """
+    ref_lists, parsed = document_ref_lists(data, root, cache_path)
+    listed: Dict[str, Tuple[List[Dict[str, Any]], int]] = {}
+    for rel_path, refs in ref_lists.items():
+        assets = []
+        for target, kind in refs:
+            path = root / target
+            if path.is_file():
+                assets.append({"path": target, "size": path.stat().st_size, "kind": kind})
+        if assets:
+            listed[rel_path] = (assets, sum(asset["size"] for asset in assets if asset["kind"] != "link"))
+    for node in iter_nodes(data):
+        if node["type"] in ("wordpad", "html") and node["path"] in listed:
+            node["assets"], node["assetBytes"] = listed[node["path"]]
+    return len(listed), parsed
@@ -0,0 +1,279 @@
+"""
+Benchmark update_filesystem.build_filesystem on synthetic content trees.
+
+Generates a public/filesystem-shaped tree (folders, .md/.txt/.jpg/.html files, references.txt
+fan-in, highlight.txt, ignore.txt, .url shortcuts, zips with and without .jsdos/), then times
+a full build, the default streamed write, a warm incremental build and an incremental build
+after touching one file.
+Results are written as JSON; pass a previous result with --compare to see the change.
+
+  python tools/benchmark_filesystem.py --folders 2000 --files 20000 --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import update_filesystem as uf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+URL_TARGETS = [
+    "https://github.com/RomanLut/{}",
+    "https://www.youtube.com/watch?v={}",
+    "https://example.com/articles/{}.html",
+]
+DOSBOX_CONF = "[cpu]\ncycles=fixed 8000\n[autoexec]\nmount c .\nc:\nDEMO.EXE\n"
+MARKDOWN = "# {title}\n\nSome text about {title}.\n\n![photo](images/photo.jpg)\n\n[Link](https://example.com/{idx})\n"
+
+
+def generate_tree(root: Path, args: argparse.Namespace) -> Dict[str, int]:
+    """Create the synthetic tree under root and return what was generated."""
+    rng = random.Random(args.seed)
+    root.mkdir(parents=True, exist_ok=True)
+    # Top-level folders hold content; "Collections" only holds references.txt files so that
+    # references never point into a folder that refers back to them.
+    top_level = max(1, min(args.folders, 8))
+    folders: List[Path] = []
+    depth: Dict[Path, int] = {}
+    for idx in range(top_level):
+        folder = root / f"Section_{idx}"
+        folder.mkdir()
+        folders.append(folder)
+        depth[folder] = 1
+    for idx in range(top_level, args.folders):
+        parent = rng.choice([folder for folder in folders[-64:] if depth[folder] < args.depth] or folders[:top_level])
+        folder = parent / f"{2000 + idx % 25}-{idx % 12 + 1:02d}_Project_{idx}"
+        folder.mkdir()
+        folders.append(folder)
+        depth[folder] = depth[parent] + 1
+
+    stats = {"folders": len(folders), "files": 0, "bytes": 0, "references": 0, "highlights": 0,
+             "ignores": 0, "urls": 0, "zips": 0, "jsdos": 0}
+
+    def write(path: Path, data: bytes) -> None:
+        path.write_bytes(data)
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+
+    files_by_folder: Dict[Path, List[str]] = {folder: [] for folder in folders}
+    for idx in range(args.files):
+        folder = rng.choice(folders)
+        kind = rng.random()
+        if kind < 0.4:
+            name = f"Article_{idx}.md"
+            write(folder / name, MARKDOWN.format(title=f"Article {idx}", idx=idx).encode("utf-8"))
+        elif kind < 0.6:
+            name = f"Notes_{idx}.txt"
+            write(folder / name, f"Notes {idx}\n".encode("utf-8") * rng.randint(1, 50))
+        elif kind < 0.9:
+            name = f"Photo_{idx}.jpg"
+            write(folder / name, rng.randbytes(rng.randint(2_000, args.max_image_bytes)))
+        else:
+            name = f"Page_{idx}.html"
+            write(folder / name, f"<html><body>Page {idx}</body></html>".encode("utf-8"))
+        files_by_folder[folder].append(name)
+    for folder in folders[::3]:
+        write(folder / "folder_image.jpg", rng.randbytes(4_000))
+        write(folder / "folder.md", f"Description of {folder.name}".encode("utf-8"))
+
+    for idx in range(args.urls):
+        folder = rng.choice(folders)
+        target = rng.choice(URL_TARGETS).format(f"item{idx}")
+        write(folder / f"Link_{idx}.url", f"[InternetShortcut]\nURL={target}\n".encode("utf-8"))
+        stats["urls"] += 1
+
+    for idx in range(args.zips):
+        folder = rng.choice(folders)
+        name = f"Program_{idx}.zip"
+        path = folder / name
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for entry in range(rng.randint(2, 20)):
+                zf.writestr(f"SRC/FILE{entry}.ASM", f"; file {entry}\n" * 50)
+            if rng.random() < args.jsdos_ratio:
+                zf.writestr(".jsdos/dosbox.conf", DOSBOX_CONF)
+                stats["jsdos"] += 1
+        stats["files"] += 1
+        stats["bytes"] += path.stat().st_size
+        stats["zips"] += 1
+        files_by_folder[folder].append(name)
+
+    for folder in rng.sample(folders, min(len(folders), args.highlights)):
+        names = [entry.name for entry in folder.iterdir() if entry.name not in ("folder.md", "folder_image.jpg")]
+        if names:
+            (folder / "highlight.txt").write_text("\n".join(rng.sample(names, min(3, len(names)))), encoding="utf-8")
+            stats["highlights"] += 1
+
+    for folder in rng.sample(folders, min(len(folders), args.ignores)):
+        if files_by_folder[folder]:
+            (folder / "ignore.txt").write_text(files_by_folder[folder][0], encoding="utf-8")
+            stats["ignores"] += 1
+
+    if args.references:
+        collections = root / "Collections"
+        collections.mkdir()
+        # A small set of popular targets gives each of them a fan-in of about --fan-in references.
+        hot = rng.sample(folders, max(1, min(len(folders), args.references // max(1, args.fan_in))))
+        per_folder = 5
+        for idx in range(0, args.references, per_folder):
+            holder = collections / f"Collection_{idx // per_folder}"
+            holder.mkdir()
+            lines = []
+            for target in rng.sample(hot, min(per_folder, len(hot), args.references - idx)):
+                lines.append(f"{target.relative_to(root).as_posix()}/")
+            (holder / "references.txt").write_text("\n".join(lines), encoding="utf-8")
+            stats["references"] += len(lines)
+    return stats
+
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Median/min wall time over repeat runs, then one more run under tracemalloc for the peak."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds_median": round(statistics.median(times), 4),
+        "seconds_min": round(min(times), 4),
+        "runs": repeat,
+        "peak_traced_bytes": peak,
+        "output_bytes": len(result.encode("utf-8")) if isinstance(result, str) else result,
+    }
+
+
+def build_once(root: Path, jobs: int, cache_path: Optional[Path]) -> str:
+    """
+    One run of the whole-tree path main() takes with --incremental or output stages: build,
+    serialize, and save the cache if incremental.
+    """
+    uf.build_cache = None
+    if cache_path is not None:
+        uf.build_cache = uf.BuildCache(cache_path)
+        uf.build_cache.load()
+    data = uf.build_filesystem(root, jobs=jobs)
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    if uf.build_cache is not None:
+        uf.build_cache.save()
+    uf.build_cache = None
+    return text
+
+
+def stream_once(root: Path, jobs: int, output_path: Path) -> int:
+    """One default run as main() does it: build and write filesystem.json in one pass; returns its size."""
+    uf.build_cache = None
+    uf.write_filesystem_streamed(root, output_path, jobs=jobs)
+    return output_path.stat().st_size
+
+
+def run_benchmarks(root: Path, args: argparse.Namespace, work_dir: Path) -> Dict[str, Any]:
+    cache_path = work_dir / "build_cache.json"
+    results: Dict[str, Any] = {}
+    results["full"] = measure(lambda: build_once(root, args.jobs, None), args.repeat)
+    results["streamed"] = measure(lambda: stream_once(root, args.jobs, work_dir / "filesystem.json"), args.repeat)
+
+    cache_path.unlink(missing_ok=True)
+    build_once(root, args.jobs, cache_path)
+    results["incremental_unchanged"] = measure(lambda: build_once(root, args.jobs, cache_path), args.repeat)
+
+    # Touch one deep file before every run so each one has a single dirty branch.
+    deepest = max((path for path in root.rglob("*.md") if path.name != "folder.md"),
+                  key=lambda path: len(path.parts), default=None)
+    counter = [0]
+
+    def touched() -> str:
+        if deepest is not None:
+            counter[0] += 1
+            deepest.write_text(f"# Edited {counter[0]}\n", encoding="utf-8")
+        return build_once(root, args.jobs, cache_path)
+
+    results["incremental_one_file"] = measure(touched, args.repeat)
+    return results
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"{'scenario':<24}{'previous s':>12}{'current s':>12}{'change':>10}{'peak MB':>10}")
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        now = result["seconds_median"]
+        if before:
+            change = f"{(now / before['seconds_median'] - 1) * 100:+.1f}%" if before["seconds_median"] else "n/a"
+            print(f"{name:<24}{before['seconds_median']:>12.4f}{now:>12.4f}{change:>10}"
+                  f"{result['peak_traced_bytes'] / 1e6:>10.1f}")
+        else:
+            print(f"{name:<24}{'-':>12}{now:>12.4f}{'':>10}{result['peak_traced_bytes'] / 1e6:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark update_filesystem.py on a synthetic content tree.")
+    parser.add_argument("--folders", type=int, default=500, help="Number of content folders (default: 500)")
+    parser.add_argument("--files", type=int, default=5000, help="Number of .md/.txt/.jpg/.html files (default: 5000)")
+    parser.add_argument("--depth", type=int, default=4, help="Maximum folder nesting depth (default: 4)")
+    parser.add_argument("--references", type=int, default=200, help="Number of references.txt entries (default: 200)")
+    parser.add_argument("--fan-in", type=int, default=5, help="Average references per referenced folder (default: 5)")
+    parser.add_argument("--highlights", type=int, default=100, help="Folders with a highlight.txt (default: 100)")
+    parser.add_argument("--ignores", type=int, default=50, help="Folders with an ignore.txt (default: 50)")
+    parser.add_argument("--urls", type=int, default=300, help="Number of .url files (default: 300)")
+    parser.add_argument("--zips", type=int, default=200, help="Number of .zip archives (default: 200)")
+    parser.add_argument("--jsdos-ratio", type=float, default=0.5, help="Share of zips with .jsdos/ (default: 0.5)")
+    parser.add_argument("--max-image-bytes", type=int, default=20_000, help="Largest synthetic image (default: 20000)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the generated tree (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario (default: 3)")
+    parser.add_argument("--jobs", type=int, default=1, help="--jobs value passed to build_filesystem (default: 1)")
+    parser.add_argument("--tree", help="Generate the tree here and keep it (default: a temporary directory)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON result to compare against")
+    args = parser.parse_args()
+
+    work_dir = Path(args.tree) if args.tree else Path(tempfile.mkdtemp(prefix="fs_bench_"))
+    root = work_dir / "filesystem"
+    if root.exists():
+        shutil.rmtree(root)
+    try:
+        start = time.perf_counter()
+        tree = generate_tree(root, args)
+        print(f"Generated {tree['folders']} folder(s), {tree['files']} file(s) in {time.perf_counter() - start:.1f}s")
+        results = run_benchmarks(root, args, work_dir)
+    finally:
+        if not args.tree:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("tree", "output", "compare")}
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "tree": tree,
+        "results": results,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+    }
+    previous = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else {}
+    compare(report, previous)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
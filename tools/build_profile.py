@@ -0,0 +1,171 @@
+"""
+Opt-in instrumentation of the filesystem generator (--profile).
+
+BuildProfiler replaces module attributes with timing wrappers at runtime and restores them
+afterwards, so runs without --profile execute the original functions untouched. Time is
+attributed exclusively: a phase's self time excludes the time of instrumented calls it made,
+so the phases (plus "other") add up to the total wall time, also for recursive functions.
+Generator functions (e.g. the streamed JSON writer) are timed per resume, so the time their
+consumer spends between items is not charged to them.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TOP_COUNT = 10
+
+
+class _AttributeProxy:
+    """Stand-in for a module global (e.g. json) with some attributes overridden."""
+
+    def __init__(self, target: Any, overrides: Dict[str, Any]) -> None:
+        self._target = target
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target, name)
+
+
+class BuildProfiler:
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.self_time: Dict[str, float] = defaultdict(float)
+        self.keyed: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.restore: List[Tuple[Any, str, Any]] = []
+        self.started = 0.0
+        self.wall = 0.0
+        self.peak = 0
+
+    def _timed(self, phase: str, call: Callable[[], Any], count: bool, key: Optional[str]) -> Any:
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        # stack[-1] accumulates the time spent in instrumented callees of the current call.
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self.lock:
+                self.calls[phase] += count
+                self.self_time[phase] += own
+                if key is not None:
+                    self.keyed[phase][key] += own
+
+    def _wrap(self, original: Callable[..., Any], phase: str, key: Optional[Callable[..., str]]) -> Callable[..., Any]:
+        if inspect.isgeneratorfunction(original):
+            def generator_wrapper(*args: Any, **kwargs: Any) -> Any:
+                gen = original(*args, **kwargs)
+                label = key(*args, **kwargs) if key is not None else None
+                first = True
+                try:
+                    while True:
+                        try:
+                            item = self._timed(phase, lambda: next(gen), first, label)
+                        except StopIteration as stop:
+                            return stop.value
+                        first = False
+                        yield item
+                finally:
+                    gen.close()
+
+            generator_wrapper.__wrapped__ = original  # type: ignore[attr-defined]
+            return generator_wrapper
+
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            label = key(*args, **kwargs) if key is not None else None
+            return self._timed(phase, lambda: original(*args, **kwargs), True, label)
+
+        wrapper.__wrapped__ = original  # type: ignore[attr-defined]
+        return wrapper
+
+    def hook(self, module: ModuleType, name: str, phase: str, key: Optional[Callable[..., str]] = None) -> None:
+        """Time module.name (or module.obj.attr for a dotted name) as part of phase."""
+        if "." in name:
+            owner_name, attr = name.split(".", 1)
+            owner = getattr(module, owner_name)
+            proxy = _AttributeProxy(owner, {attr: self._wrap(getattr(owner, attr), phase, key)})
+            self.restore.append((module, owner_name, owner))
+            setattr(module, owner_name, proxy)
+            return
+        original = getattr(module, name)
+        self.restore.append((module, name, original))
+        setattr(module, name, self._wrap(original, phase, key))
+
+    def hook_all(self, module: ModuleType, phases: Dict[str, Iterable[str]]) -> None:
+        for phase, names in phases.items():
+            for name in names:
+                self.hook(module, name, phase)
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.wall = time.perf_counter() - self.started
+        _, self.peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        for module, name, original in reversed(self.restore):
+            setattr(module, name, original)
+        self.restore.clear()
+
+    def report(self, outputs: Iterable[Path] = ()) -> Dict[str, Any]:
+        phases = {
+            phase: {"calls": self.calls[phase], "seconds": round(self.self_time[phase], 6)}
+            for phase in sorted(self.self_time, key=self.self_time.get, reverse=True)
+        }
+        phases["other"] = {"calls": 0, "seconds": round(max(0.0, self.wall - sum(self.self_time.values())), 6)}
+        slowest = {
+            phase: [[key, round(seconds, 6)] for key, seconds in sorted(times.items(), key=lambda kv: -kv[1])[:TOP_COUNT]]
+            for phase, times in self.keyed.items()
+        }
+        output_sizes = {}
+        for path in outputs:
+            if path.is_file():
+                output_sizes[str(path)] = path.stat().st_size
+            elif path.is_dir():
+                output_sizes[str(path)] = sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+        return {
+            "wall_seconds": round(self.wall, 6),
+            "peak_traced_bytes": self.peak,
+            "phases": phases,
+            "slowest": slowest,
+            "output_bytes": output_sizes,
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    wall = report["wall_seconds"] or 1e-9
+    print()
+    print(f"{'phase':<20}{'calls':>10}{'seconds':>12}{'share':>8}")
+    for phase, stats in report["phases"].items():
+        print(f"{phase:<20}{stats['calls']:>10}{stats['seconds']:>12.4f}{stats['seconds'] / wall:>8.1%}")
+    print(f"{'total':<20}{'':>10}{report['wall_seconds']:>12.4f}")
+    for phase, entries in report["slowest"].items():
+        if entries:
+            print(f"\nSlowest ({phase}):")
+            for key, seconds in entries:
+                print(f"  {seconds:10.4f}s  {key}")
+    print(f"\nPeak traced memory: {report['peak_traced_bytes'] / 1024 / 1024:.1f} MB")
+    for path, size in report["output_bytes"].items():
+        print(f"Output {path}: {size} bytes")
+
+
+def write_report(report: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
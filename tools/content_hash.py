@@ -0,0 +1,128 @@
+"""
+Content hashes of every file item of the filesystem tree.
+
+Files are hashed with chunked reads in a process pool and the digests are cached by mtime and
+size, so a warm run only stats the files. Optionally writes a rename map to content-addressed
+names and hardlinked (or copied) hashed files that a static host can serve as immutable.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes, write_text_if_changed
+
+
+HASHED_DIR_NAME = "filesystem.hashed"
+HASH_MAP_NAME = "filesystem.hashmap.json"
+HASH_VERSION = 1
+HASH_LENGTH = 16
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Full SHA-256 hex digest of a file, read in chunks; runs in a worker process."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(root: Path, rel_paths: List[str], cache: FileCache, jobs: int = 1) -> Tuple[Dict[str, str], int]:
+    """
+    Digest of every path, hashing only files whose mtime or size changed since they were cached.
+
+    Returns (digests, files hashed).
+    """
+    digests: Dict[str, str] = {}
+    pending: List[Tuple[str, os.stat_result]] = []
+    for rel_path in rel_paths:
+        st = (root / rel_path).stat()
+        cached = cache.lookup(rel_path, st)
+        if cached is None:
+            pending.append((rel_path, st))
+        else:
+            digests[rel_path] = cached
+    if len(pending) > 1 and jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(hash_file, [str(root / rel_path) for rel_path, _ in pending], chunksize=8)
+            computed = list(results)
+    else:
+        computed = [hash_file(str(root / rel_path)) for rel_path, _ in pending]
+    for (rel_path, st), digest in zip(pending, computed):
+        cache.store(rel_path, st, digest)
+        digests[rel_path] = digest
+    return digests, len(pending)
+
+
+def hashed_name(rel_path: str, digest: str) -> str:
+    """"dir/name.ext" -> "dir/name.<hash>.ext"."""
+    path = PurePosixPath(rel_path)
+    return str(path.with_name(f"{path.stem}.{digest[:HASH_LENGTH]}{path.suffix}"))
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def write_hashed_copies(root: Path, out_dir: Path, rename_map: Dict[str, str]) -> int:
+    """Hardlink or copy every file to its hashed name and delete hashed files no longer mapped."""
+    created = 0
+    for rel_path, name in rename_map.items():
+        dst = out_dir / name
+        if not dst.exists():
+            link_or_copy(root / rel_path, dst)
+            created += 1
+    keep = set(rename_map.values())
+    for dirpath, _, filenames in os.walk(out_dir, topdown=False):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if path.relative_to(out_dir).as_posix() not in keep:
+                path.unlink()
+        if dirpath != str(out_dir) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return created
+
+
+def hash_items(
+    data: Dict[str, Any],
+    root: Path,
+    out_dir: Path,
+    cache_path: Path,
+    jobs: int = 1,
+    emit: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    Add "hash" (first 16 hex digits of the SHA-256) to every file item.
+
+    emit="map" also writes HASH_MAP_NAME {path: hashed path} into out_dir; emit="copies"
+    additionally materializes the hashed files under HASHED_DIR_NAME and adds "hashed" (path
+    relative to /filesystem/) to the items. Returns (items hashed, files read).
+    """
+    cache = FileCache(cache_path, version=HASH_VERSION)
+    nodes = [node for node in iter_nodes(data) if node["type"] != "folder"]
+    rel_paths = sorted({node["path"] for node in nodes})
+    digests, read = hash_files(root, rel_paths, cache, jobs)
+    cache.save()
+
+    rename_map = {rel_path: hashed_name(rel_path, digests[rel_path]) for rel_path in rel_paths}
+    for node in nodes:
+        node["hash"] = digests[node["path"]][:HASH_LENGTH]
+        if emit == "copies":
+            node["hashed"] = f"{HASHED_DIR_NAME}/{rename_map[node['path']]}"
+    if emit in ("map", "copies"):
+        write_text_if_changed(out_dir / HASH_MAP_NAME, json.dumps(rename_map, indent=2, ensure_ascii=False))
+    if emit == "copies":
+        write_hashed_copies(root, out_dir / HASHED_DIR_NAME, rename_map)
+    return len(nodes), read
@@ -0,0 +1,217 @@
+"""
+Find byte-identical article images across images/ folders and deduplicate them.
+
+Builds on the generator's scan (update_filesystem.scan_tree) and content hashing
+(content_hash.hash_files): only files whose size collides with another image are hashed, in a
+process pool, with digests cached in .cache/dedupe_images.json.
+
+  --mode store     (default) moves the content to images/<hash>.<ext> at the content root and
+                   rewrites the markdown references of the article next to each copy, then
+                   deletes copies that no .md/.html document of the tree refers to anymore. The deploy gets smaller
+                   and browsers cache one URL per image.
+  --mode hardlink  replaces every duplicate with a hardlink to one copy. This only saves local
+                   disk space: git, the copy of public/ into the build and the Pages artifact do
+                   not preserve hardlinks, and every copy keeps its own URL.
+
+Neither mode changes filesystem.json: images/ folders (the store included) are never listed.
+Use --dry-run to only print the duplicate groups and the bytes that would be saved.
+
+  python tools/dedupe_images.py --dry-run
+  python tools/dedupe_images.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+import update_filesystem as uf
+from asset_manifest import document_ref_lists, document_refs
+from content_hash import HASH_LENGTH, HASH_VERSION, hash_files, link_or_copy
+from fs_util import FileCache
+
+
+ARTICLE_IMAGES_DIR = "images"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".svg"}
+DOCUMENT_SUFFIXES = {".md"}
+
+
+def scan_article_images(root: Path, jobs: int) -> Dict[str, int]:
+    """{path relative to root: size} of every image inside an images/ folder of a listed folder."""
+    images: Dict[str, int] = {}
+    listings = uf.scan_tree(root, max(1, jobs))
+    stack = [entry.path for entries in listings.values() for entry in entries
+             if entry.is_dir and entry.name == ARTICLE_IMAGES_DIR]
+    while stack:
+        folder = stack.pop()
+        for entry in uf.scan_folder(folder):
+            if entry.is_dir and not entry.name.startswith("."):
+                stack.append(entry.path)
+            elif entry.is_file and entry.path.suffix.lower() in IMAGE_SUFFIXES:
+                images[entry.path.relative_to(root).as_posix()] = entry.size
+    return images
+
+
+def find_duplicates(root: Path, images: Dict[str, int], jobs: int) -> List[Tuple[str, List[str]]]:
+    """[(digest, sorted paths)] of byte-identical images; only same-size files are hashed."""
+    by_size: Dict[int, List[str]] = {}
+    for rel_path, size in images.items():
+        if size:
+            by_size.setdefault(size, []).append(rel_path)
+    candidates = sorted(path for paths in by_size.values() if len(paths) > 1 for path in paths)
+    cache = FileCache(uf.CACHE_DIR / "dedupe_images.json", version=HASH_VERSION)
+    digests, _ = hash_files(root, candidates, cache, jobs)
+    cache.save()
+    groups: Dict[str, List[str]] = {}
+    for rel_path in candidates:
+        groups.setdefault(digests[rel_path], []).append(rel_path)
+    return sorted((digest, paths) for digest, paths in groups.items() if len(paths) > 1)
+
+
+def article_folder(rel_path: str) -> Tuple[str, str]:
+    """("dir/images/a/b.jpg") -> ("dir", "images/a/b.jpg"): the folder whose documents refer to it."""
+    parts = rel_path.split("/")
+    idx = len(parts) - 1 - parts[::-1].index(ARTICLE_IMAGES_DIR)
+    return "/".join(parts[:idx]), "/".join(parts[idx:])
+
+
+def reference_pattern(refs: List[str]) -> re.Pattern:
+    """A markdown/HTML reference to any of refs (optionally "./"-prefixed or URL-quoted)."""
+    variants = sorted({form for ref in refs for form in (ref, quote(ref))}, key=len, reverse=True)
+    alternation = "|".join(re.escape(form) for form in variants)
+    return re.compile(rf"(?<=[(\"'])(?:\./)?({alternation})(?=[)\"'\s])")
+
+
+def hardlink_duplicates(root: Path, groups: List[Tuple[str, List[str]]], dry_run: bool) -> int:
+    """Point every copy at the first one's inode; returns the bytes freed."""
+    saved = 0
+    for _, paths in groups:
+        canonical = root / paths[0]
+        for rel_path in paths[1:]:
+            path = root / rel_path
+            if os.path.samefile(canonical, path):
+                continue
+            saved += path.stat().st_size
+            if not dry_run:
+                tmp = path.with_name(f".{path.name}.tmp")
+                os.link(canonical, tmp)
+                os.replace(tmp, path)
+    return saved
+
+
+def store_duplicates(
+    root: Path,
+    groups: List[Tuple[str, List[str]]],
+    ref_lists: Dict[str, List[Tuple[str, str]]],
+    dry_run: bool,
+) -> Tuple[int, int]:
+    """
+    Move duplicates to the shared store and rewrite the articles referring to them.
+
+    ref_lists are the asset_manifest.document_ref_lists() of the tree; entries of rewritten
+    documents are replaced. Returns (bytes freed, documents rewritten); a new store file counts
+    against the bytes freed. A copy is deleted only when at least one reference to it was
+    rewritten, no document of its article folder mentions it anymore and no .md/.html document
+    of the tree (HTML pages, ../Other/images/ links) still resolves to it.
+    """
+    # {article folder: {reference: path relative to the article folder}}
+    rewrites: Dict[str, Dict[str, str]] = {}
+    saved = 0
+    for digest, paths in groups:
+        store_rel = f"{ARTICLE_IMAGES_DIR}/{digest[:HASH_LENGTH]}{Path(paths[0]).suffix.lower()}"
+        for rel_path in paths:
+            folder, ref = article_folder(rel_path)
+            target = os.path.relpath(root / store_rel, root / folder).replace(os.sep, "/")
+            rewrites.setdefault(folder, {})[ref] = target
+        if not (root / store_rel).exists():
+            saved -= (root / paths[0]).stat().st_size
+            if not dry_run:
+                link_or_copy(root / paths[0], root / store_rel)
+
+    documents = 0
+    mentions: Dict[str, Tuple[set, List[str]]] = {}
+    for folder, mapping in sorted(rewrites.items()):
+        pattern = reference_pattern(list(mapping))
+        targets = {form: mapping[ref] for ref in mapping for form in (ref, quote(ref))}
+        rewritten = set()
+        texts: List[str] = []
+        for doc in sorted((root / folder).iterdir()):
+            if not doc.is_file() or doc.suffix.lower() not in DOCUMENT_SUFFIXES:
+                continue
+            # Bytes in and out, so line endings and undecodable bytes survive the rewrite.
+            text = doc.read_bytes().decode("utf-8", errors="surrogateescape")
+            new_text = pattern.sub(lambda m: targets[m.group(1)], text)
+            rewritten.update(m.group(1) for m in pattern.finditer(text))
+            texts.append(new_text)
+            if new_text != text:
+                documents += 1
+                raw = new_text.encode("utf-8", errors="surrogateescape")
+                doc_rel = doc.relative_to(root).as_posix()
+                if doc_rel in ref_lists:
+                    ref_lists[doc_rel] = document_refs(doc, doc_rel, True, raw)
+                if not dry_run:
+                    tmp = doc.with_name(f".{doc.name}.tmp")
+                    tmp.write_bytes(raw)
+                    os.replace(tmp, doc)
+        mentions[folder] = (rewritten, texts)
+
+    # Compared case-insensitively, so a link that only works on a case-insensitive disk keeps its copy.
+    reachable = {target.lower() for refs in ref_lists.values() for target, _ in refs}
+    for folder, mapping in sorted(rewrites.items()):
+        rewritten, texts = mentions[folder]
+        for ref in mapping:
+            path = root / folder / ref
+            if path.relative_to(root).as_posix().lower() in reachable:
+                continue
+            if {ref, quote(ref)} & rewritten and not any(ref in text or quote(ref) in text for text in texts):
+                saved += path.stat().st_size
+                if not dry_run:
+                    path.unlink()
+                    if not any(path.parent.iterdir()):
+                        path.parent.rmdir()
+    return saved, documents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deduplicate identical images in the images/ folders of articles.")
+    parser.add_argument("--root", default=str(uf.ROOT), help="Content root (default: public/filesystem)")
+    parser.add_argument(
+        "--mode",
+        choices=("store", "hardlink"),
+        default="store",
+        help="store: move copies to images/<hash>.<ext> and rewrite markdown references; hardlink: "
+        "link copies together, which only saves local disk space (default: store)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only report duplicates and the bytes that would be saved")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Hashing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    images = scan_article_images(root, args.jobs)
+    groups = find_duplicates(root, images, max(1, args.jobs))
+    for digest, paths in groups:
+        print(f"{digest[:HASH_LENGTH]}  {images[paths[0]]:>10} bytes x {len(paths)}")
+        for rel_path in paths:
+            print(f"    {rel_path}")
+    duplicate_bytes = sum(images[paths[0]] * (len(paths) - 1) for _, paths in groups)
+    print(f"{len(images)} image(s), {len(groups)} duplicate group(s), {duplicate_bytes} duplicate byte(s)")
+
+    if args.mode == "hardlink":
+        saved = hardlink_duplicates(root, groups, args.dry_run)
+        verb = "Would free" if args.dry_run else "Freed"
+        print(f"{verb} {saved} byte(s) by hardlinking duplicates")
+    else:
+        data = uf.build_filesystem(root, max(1, args.jobs))
+        ref_lists, _ = document_ref_lists(data, root, uf.CACHE_DIR / "asset_manifest.json")
+        saved, documents = store_duplicates(root, groups, ref_lists, args.dry_run)
+        verb = "Would free" if args.dry_run else "Freed"
+        print(f"{verb} {saved} byte(s) by moving duplicates to {ARTICLE_IMAGES_DIR}/ "
+              f"({documents} document(s) rewritten)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,56 @@
 from __future__ import annotations
 
 import argparse
+import codecs
+import hashlib
+import http.client
+import json
 import os
 import re
+import sys
+import threading
+import time
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from html import unescape
 from html.parser import HTMLParser
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from content_hash import hash_file, link_or_copy
+from fs_util import write_text_atomic
+from http_pool import ConnectionPool, HttpError
+
+
+CHUNK_SIZE = 64 * 1024
+# One attribute of a start tag: name, "=", then a double-quoted, single-quoted or bare value.
+ATTR_RE = re.compile(r"""([^\s"'<>/=]+)(\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""")
+URL_TOKEN_RE = re.compile(r"[^\s,]+")
+DEFAULT_CACHE = Path(__file__).resolve().parent.parent / ".cache" / "fetch_article.json"
+# Batch mode keeps one download per remote URL here; images/ holds one copy per distinct content.
+STAGING_DIR_NAME = ".downloads"
+# Seconds between saves of the HTTP cache while downloads are running.
+CACHE_SAVE_INTERVAL = 2.0
+# What a failed page or image download raises; batch mode reports these per article.
+FETCH_ERRORS = (OSError, ValueError, HttpError, http.client.HTTPException)
 
 
 class ImgTagParser(HTMLParser):
-    """Collect <img> tag attribute dictionaries."""
+    """Collect <img> tag attribute dictionaries and the (line, column, raw text) span of each tag."""
 
     def __init__(self) -> None:
         super().__init__()
         self.images: List[Dict[str, str]] = []
+        self.spans: List[Tuple[int, int, str]] = []
 
     def handle_starttag(self, tag: str, attrs: List[Tuple[str, str]]) -> None:
         if tag.lower() != "img":
             return
         self.images.append({k: v for k, v in attrs if v is not None})
+        line, column = self.getpos()
+        self.spans.append((line, column, self.get_starttag_text() or ""))
 
 
 def choose_best_image(attrs: Dict[str, str]) -> Tuple[str | None, List[str]]:
@@ -85,73 +115,538 @@ def sanitize_filename(url: str, used_names: set[str]) -> str:
     return candidate
 
 
-def download_file(url: str, dest: Path) -> None:
+class HttpCache:
+    """
+    ETag/Last-Modified validators of downloaded URLs.
+
+    An entry is {"etag", "last_modified", "size"} for a completed file, or has "partial": true
+    while a download is in progress, so an interrupted one can resume with a Range request.
+    Changes are written at most every CACHE_SAVE_INTERVAL seconds while downloads run, and by
+    save() when the run ends or is interrupted.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        # Serializes writers of the cache file; set() never waits for a write in progress.
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path is not None:
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                pass
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.entries.get(url)
+
+    def set(self, url: str, entry: Optional[Dict[str, Any]]) -> None:
+        with self.lock:
+            if entry:
+                self.entries[url] = entry
+            else:
+                self.entries.pop(url, None)
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= CACHE_SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        """Write the entries if they changed since the last save."""
+        if self.path is None or self.save_lock.locked():
+            return
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                text = json.dumps(self.entries, indent=1, ensure_ascii=False)
+                self.dirty = False
+                self.saved_at = time.monotonic()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self.path, text)
+
+
+def response_validators(resp: Any) -> Dict[str, str]:
+    values = {"etag": resp.getheader("ETag"), "last_modified": resp.getheader("Last-Modified")}
+    return {key: value for key, value in values.items() if value}
+
+
+def range_validator(entry: Dict[str, Any]) -> Optional[str]:
+    """Value for If-Range; weak ETags cannot be used to resume."""
+    etag = entry.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return entry.get("last_modified")
+
+
+def download_file(
+    url: str, dest: Path, pool: Optional[ConnectionPool] = None, cache: Optional[HttpCache] = None
+) -> str:
+    """
+    Stream url to dest through a temporary .part file and an atomic rename.
+
+    With a cache, an existing dest is revalidated with a conditional request, and a .part file
+    left by an interrupted run is resumed with a Range request. Returns "downloaded",
+    "resumed" or "unchanged".
+    """
     dest.parent.mkdir(parents=True, exist_ok=True)
-    req = urllib.request.Request(url, headers={"User-Agent": "fetch_article/1.0"})
-    with urllib.request.urlopen(req) as resp, open(dest, "wb") as f:
-        f.write(resp.read())
+    if pool is None:
+        with ConnectionPool() as own_pool:
+            return download_file(url, dest, own_pool, cache)
+    part = dest.with_name(f".{dest.name}.part")
+    entry = cache.get(url) if cache is not None else None
+    headers: Dict[str, str] = {}
+    offset = 0
+    if dest.exists() and cache is not None:
+        if entry and not entry.get("partial") and entry.get("size") == dest.stat().st_size:
+            if "etag" in entry:
+                headers["If-None-Match"] = entry["etag"]
+            if "last_modified" in entry:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        elif not entry:
+            headers["If-Modified-Since"] = formatdate(dest.stat().st_mtime, usegmt=True)
+    elif part.exists() and entry and entry.get("partial") and range_validator(entry):
+        offset = part.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = range_validator(entry)
+
+    try:
+        with pool.open(url, headers=headers) as (resp, _):
+            if resp.status == 304:
+                return "unchanged"
+            validators = response_validators(resp)
+            content_range = resp.getheader("Content-Range") or ""
+            resume = resp.status == 206 and offset > 0 and content_range.startswith(f"bytes {offset}-")
+            if resp.status == 206 and not resume:
+                raise HttpError(url, 416, "unexpected Content-Range")
+            if cache is not None:
+                cache.set(url, {**validators, "partial": True} if validators else None)
+            with open(part, "ab" if resume else "wb") as f:
+                while True:
+                    chunk = resp.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+    except HttpError as exc:
+        if exc.status != 416 or not offset:
+            raise
+        # The partial file does not match the remote one any more; start over.
+        part.unlink()
+        if cache is not None:
+            cache.set(url, None)
+        return download_file(url, dest, pool, cache)
+
+    os.replace(part, dest)
+    if cache is not None:
+        cache.set(url, {**validators, "size": dest.stat().st_size} if validators else None)
+    return "resumed" if resume else "downloaded"
+
+
+def download_all(
+    downloads: List[Tuple[str, Path]],
+    pool: ConnectionPool,
+    concurrency: int,
+    cache: Optional[HttpCache] = None,
+    errors: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """
+    Download (url, dest) pairs on up to `concurrency` threads.
+
+    The first failure is re-raised, unless errors is given: then every failure is recorded
+    there as {url: message} with the status "failed", and the other downloads still complete.
+    """
+
+    def download(url: str, dest: Path) -> str:
+        try:
+            return download_file(url, dest, pool, cache)
+        except FETCH_ERRORS as exc:
+            if errors is None:
+                raise
+            errors[url] = str(exc) or type(exc).__name__
+            return "failed"
+
+    if concurrency <= 1:
+        return [download(url, dest) for url, dest in downloads]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(download, url, dest) for url, dest in downloads]
+        return [future.result() for future in futures]
+
+
+def read_text(pool: ConnectionPool, url: str) -> str:
+    """Fetch a page in chunks, decoding as it arrives instead of buffering the raw bytes."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts: List[str] = []
+    with pool.open(url) as (resp, _):
+        while True:
+            chunk = resp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def trie_pattern(words: List[str]) -> str:
+    """
+    Regex matching any of words, factored into a trie.
+
+    Alternatives at each node start with different characters, so matching costs one branch per
+    character instead of one attempt per word, and greedy optional groups make the longest word win.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = []
+        for ch in sorted(key for key in node if key):
+            chain = [ch]
+            child = node[ch]
+            # Collapse single-child chains so the recursion depth follows branching, not URL length.
+            while len(child) == 1 and "" not in child:
+                (next_ch, child), = child.items()
+                chain.append(next_ch)
+            branches.append(re.escape("".join(chain)) + build(child))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
 
+class UrlRewriter:
+    """
+    Rewrites remote URLs to local paths in a single pass over a document.
+
+    Every URL also matches without its query string. Where several URLs match at one position
+    (one is a prefix of another), the longest one wins.
+    """
+
+    def __init__(self, replacements: Dict[str, str]) -> None:
+        self.targets: Dict[str, str] = dict(replacements)
+        for remote, local in replacements.items():
+            no_query = urllib.parse.urlsplit(remote)._replace(query="").geturl()
+            self.targets.setdefault(no_query, local)
+        self.pattern = re.compile(trie_pattern(list(self.targets))) if self.targets else None
+
+    def sub(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(lambda match: self.targets[match.group(0)], text)
+
+    def rewrite_tag(self, tag_text: str, page_url: str) -> str:
+        """Rewrite URLs in the attribute values of one start tag, resolving relative ones against page_url."""
+
+        def rewrite_token(match: re.Match[str]) -> str:
+            token = match.group(0)
+            return self.targets.get(urllib.parse.urljoin(page_url, unescape(token)), token)
 
-def rewrite_html_links(html: str, replacements: Dict[str, str]) -> str:
-    """Replace remote URLs with local relative paths."""
-    for remote, local in replacements.items():
-        html = html.replace(remote, local)
-        # Also replace variant without query if present.
-        no_query = urllib.parse.urlsplit(remote)._replace(query="").geturl()
-        if no_query != remote:
-            html = html.replace(no_query, local)
-    return html
+        def rewrite_attr(match: re.Match[str]) -> str:
+            name, equals = match.group(1), match.group(2)
+            for idx, quote in ((3, '"'), (4, "'"), (5, "")):
+                value = match.group(idx)
+                if value is not None:
+                    return f"{name}{equals}{quote}{URL_TOKEN_RE.sub(rewrite_token, value)}{quote}"
+            return match.group(0)
 
+        return ATTR_RE.sub(rewrite_attr, tag_text)
+
+
+def rewrite_html_links(html: str, replacements: Dict[str, str], page_url: Optional[str] = None) -> str:
+    """
+    Replace remote URLs with local relative paths in one pass.
+
+    With page_url, <img> attribute values are rewritten first, so relative and HTML-escaped
+    URLs (src="/wp-content/...", srcset entries) are matched after resolving them.
+    """
+    rewriter = UrlRewriter(replacements)
+    if page_url is not None and rewriter.targets:
+        parser = ImgTagParser()
+        parser.feed(html)
+        parser.close()
+        line_starts = [0] + [match.end() for match in re.finditer("\n", html)]
+        pieces: List[str] = []
+        last = 0
+        for line, column, tag_text in parser.spans:
+            start = line_starts[line - 1] + column
+            if start < last or html[start:start + len(tag_text)] != tag_text:
+                continue
+            pieces.append(rewriter.sub(html[last:start]))
+            pieces.append(rewriter.rewrite_tag(tag_text, page_url))
+            last = start + len(tag_text)
+        pieces.append(rewriter.sub(html[last:]))
+        return "".join(pieces)
+    return rewriter.sub(html)
 
-def fetch_article(page_url: str, html_path: Path, images_dir: Path) -> None:
+
+def fetch_article(
+    page_url: str,
+    html_path: Path,
+    images_dir: Path,
+    concurrency: int = 4,
+    cache_path: Optional[Path] = DEFAULT_CACHE,
+) -> None:
     html_path.parent.mkdir(parents=True, exist_ok=True)
+    cache = HttpCache(cache_path) if cache_path is not None else None
 
-    # Download HTML
-    req = urllib.request.Request(page_url, headers={"User-Agent": "fetch_article/1.0"})
-    with urllib.request.urlopen(req) as resp:
-        html_bytes = resp.read()
-    html_text = html_bytes.decode("utf-8", errors="ignore")
+    try:
+        with ConnectionPool() as pool:
+            # Download HTML
+            html_text = read_text(pool, page_url)
+            rewritten_html = localize_images(html_text, page_url, images_dir, pool, concurrency, cache)
+    finally:
+        if cache is not None:
+            cache.save()
+    html_path.write_text(rewritten_html, encoding="utf-8")
 
-    parser = ImgTagParser()
-    parser.feed(html_text)
 
+def localize_images(
+    html_text: str,
+    page_url: str,
+    images_dir: Path,
+    pool: ConnectionPool,
+    concurrency: int,
+    cache: Optional[HttpCache] = None,
+) -> str:
+    """Download the best variant of every <img> and return the HTML pointing at the local copies."""
     replacements: Dict[str, str] = {}
     used_names: set[str] = set()
+    downloads: List[Tuple[str, Path]] = []
 
-    for attrs in parser.images:
-        chosen, variants = choose_best_image(attrs)
-        if not chosen:
-            continue
-        abs_url = urllib.parse.urljoin(page_url, chosen)
+    # Names are assigned in document order before downloading, so they do not depend on timing.
+    for abs_url, variants in collect_images(html_text, page_url):
         filename = sanitize_filename(abs_url, used_names)
         local_rel = f"images/{filename}"
         local_path = images_dir / filename
 
-        # Download the file if not already present
-        if not local_path.exists():
-            download_file(abs_url, local_path)
+        # Without a cache only missing files are fetched; with one, existing files are revalidated.
+        if cache is not None or not local_path.exists():
+            downloads.append((abs_url, local_path))
 
         for variant in variants:
-            full_variant = urllib.parse.urljoin(page_url, variant)
-            replacements[full_variant] = local_rel
+            replacements[variant] = local_rel
 
-    rewritten_html = rewrite_html_links(html_text, replacements)
-    html_path.write_text(rewritten_html, encoding="utf-8")
+    download_all(downloads, pool, concurrency, cache)
+    return rewrite_html_links(html_text, replacements, page_url)
+
+
+def collect_images(html_text: str, page_url: str) -> List[Tuple[str, List[str]]]:
+    """(absolute URL to download, absolute URL variants to replace) for every <img>, in document order."""
+    parser = ImgTagParser()
+    parser.feed(html_text)
+    images = []
+    for attrs in parser.images:
+        chosen, variants = choose_best_image(attrs)
+        if not chosen:
+            continue
+        abs_variants = [urllib.parse.urljoin(page_url, variant) for variant in variants]
+        images.append((urllib.parse.urljoin(page_url, chosen), abs_variants))
+    return images
+
+
+def read_url_list(source: str, pool: ConnectionPool) -> List[str]:
+    """Article URLs from a text file or URL (one per line, # comments) or an XML sitemap / sitemap index."""
+    if source.startswith(("http://", "https://")):
+        text = read_text(pool, source)
+    else:
+        text = Path(source).read_text(encoding="utf-8")
+    if text.lstrip().startswith("<"):
+        root = ElementTree.fromstring(text.lstrip())
+        locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+        if root.tag.endswith("sitemapindex"):
+            return [url for loc in locs for url in read_url_list(loc, pool)]
+        return locs
+    lines = (line.strip() for line in text.splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def article_slug(url: str, used: set[str]) -> str:
+    """Unique file stem for an article: "page_id_429" for ?page_id=429, otherwise the last path segment."""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qs(parts.query)
+    base = next((f"{key}_{query[key][0]}" for key in ("page_id", "p") if key in query), "")
+    if not base:
+        segment = Path(parts.path.rstrip("/"))
+        base = (segment.stem if segment.suffix.lower() in (".html", ".htm", ".php") else segment.name) or parts.netloc
+    base = re.sub(r"[^\w.-]+", "_", base).strip("_") or "article"
+    candidate = base
+    counter = 1
+    while candidate in used:
+        candidate = f"{base}_{counter}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def staging_name(url: str) -> str:
+    suffix = Path(urllib.parse.urlsplit(url).path).suffix or ".jpg"
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}{suffix}"
+
+
+def fetch_articles(
+    urls: List[str],
+    out_dir: Path,
+    concurrency: int = 4,
+    cache_path: Optional[Path] = DEFAULT_CACHE,
+) -> Dict[str, int]:
+    """
+    Fetch several articles into out_dir/<slug>.html with one shared out_dir/images/.
+
+    Pages and images are fetched concurrently, every remote URL is downloaded once, and images
+    with identical content are stored once under the name of their first occurrence. A failed
+    page or image fails only its own article(s): the others are still written. Returns counters
+    for the summary plus "failed" ({article URL: [error messages]}); "saved" is the bytes a
+    separate run per article would have stored on top of the shared store.
+    """
+    cache = HttpCache(cache_path) if cache_path is not None else None
+    staging_dir = out_dir / STAGING_DIR_NAME
+    images_dir = out_dir / "images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    used_slugs: set[str] = set()
+    slugs = [article_slug(url, used_slugs) for url in urls]
+
+    page_errors: Dict[str, str] = {}
+    image_errors: Dict[str, str] = {}
+
+    def read_page(url: str) -> Optional[str]:
+        try:
+            return read_text(pool, url)
+        except FETCH_ERRORS as exc:
+            page_errors[url] = str(exc) or type(exc).__name__
+            return None
+
+    try:
+        with ConnectionPool() as pool:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                fetched = list(executor.map(read_page, urls))
+            articles = [
+                collect_images(html_text, url) if html_text is not None else []
+                for html_text, url in zip(fetched, urls)
+            ]
+            unique_urls = list(dict.fromkeys(abs_url for images in articles for abs_url, _ in images))
+            download_all(
+                [(url, staging_dir / staging_name(url)) for url in unique_urls], pool, concurrency, cache, image_errors
+            )
+    finally:
+        if cache is not None:
+            cache.save()
+
+    failed: Dict[str, List[str]] = {}
+    for url, images in zip(urls, articles):
+        messages = [f"page: {page_errors[url]}"] if url in page_errors else []
+        image_urls = dict.fromkeys(abs_url for abs_url, _ in images)
+        messages += [f"{abs_url}: {image_errors[abs_url]}" for abs_url in image_urls if abs_url in image_errors]
+        if messages:
+            failed[url] = messages
+    done = [
+        (slug, url, html_text, images)
+        for slug, url, html_text, images in zip(slugs, urls, fetched, articles)
+        if url not in failed
+    ]
+    unique_urls = list(dict.fromkeys(abs_url for _, _, _, images in done for abs_url, _ in images))
+
+    # Names follow the first occurrence in article order, so they do not depend on download timing.
+    digests = {url: hash_file(str(staging_dir / staging_name(url))) for url in unique_urls}
+    stored: Dict[str, str] = {}
+    names: Dict[str, str] = {}
+    used_names: set[str] = set()
+    for url in unique_urls:
+        digest = digests[url]
+        if digest not in stored:
+            stored[digest] = sanitize_filename(url, used_names)
+            dest = images_dir / stored[digest]
+            if not dest.exists() or hash_file(str(dest)) != digest:
+                # Downloads replace staged files by rename, so a hardlink never changes under dest.
+                dest.unlink(missing_ok=True)
+                link_or_copy(staging_dir / staging_name(url), dest)
+        names[url] = stored[digest]
+
+    for slug, url, html_text, images in done:
+        replacements = {variant: f"images/{names[abs_url]}" for abs_url, variants in images for variant in variants}
+        (out_dir / f"{slug}.html").write_text(rewrite_html_links(html_text, replacements, url), encoding="utf-8")
+
+    sizes = {digest: (images_dir / name).stat().st_size for digest, name in stored.items()}
+    per_article = sum(
+        sizes[digests[abs_url]] for _, _, _, images in done for abs_url in dict.fromkeys(url for url, _ in images)
+    )
+    return {
+        "articles": len(done),
+        "references": sum(len(images) for _, _, _, images in done),
+        "urls": len(unique_urls),
+        "images": len(stored),
+        "stored": sum(sizes.values()),
+        "saved": per_article - sum(sizes.values()),
+        "failed": failed,
+    }
 
 
 def main() -> None:
     default_url = "http://localhost:8080/?page_id=429"
     parser = argparse.ArgumentParser(description="Download WordPress article HTML and images.")
     parser.add_argument("--url", default=default_url, help="Article URL to fetch")
+    parser.add_argument(
+        "--batch",
+        help="File or URL with article URLs (one per line) or an XML sitemap; fetches all of them into --out-dir",
+    )
+    parser.add_argument(
+        "--out-dir",
+        default="temp/articles",
+        help="Batch mode: directory for <article>.html files and the shared images/ folder",
+    )
     parser.add_argument("--html", default="temp/article.html", help="Path to save fetched HTML")
     parser.add_argument(
         "--images-dir", default="temp/images", help="Directory to save downloaded images"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of images downloaded in parallel over keep-alive connections (default: 4)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=str(DEFAULT_CACHE),
+        help="ETag/Last-Modified cache used to revalidate and resume downloads (default: .cache/fetch_article.json)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Only download images that do not exist locally, without conditional requests",
+    )
     args = parser.parse_args()
 
+    cache_path = None if args.no_cache else Path(args.cache)
+    concurrency = max(1, args.concurrency)
+    if args.batch:
+        with ConnectionPool() as pool:
+            urls = list(dict.fromkeys(read_url_list(args.batch, pool)))
+        out_dir = Path(args.out_dir)
+        stats = fetch_articles(urls, out_dir, concurrency=concurrency, cache_path=cache_path)
+        print(f"Saved {stats['articles']} article(s) to {out_dir}")
+        print(
+            f"{stats['references']} image reference(s), {stats['urls']} distinct URL(s), "
+            f"{stats['images']} distinct image(s) stored ({stats['stored']} bytes)"
+        )
+        print(f"Deduplication saved {stats['saved']} bytes compared to fetching each article separately")
+        if stats["failed"]:
+            print(f"\n{len(stats['failed'])} article(s) failed:", file=sys.stderr)
+            for url, messages in stats["failed"].items():
+                print(f"  {url}", file=sys.stderr)
+                for message in messages:
+                    print(f"    {message}", file=sys.stderr)
+            sys.exit(1)
+        return
+
     html_path = Path(args.html)
     images_dir = Path(args.images_dir)
-    fetch_article(args.url, html_path, images_dir)
+    fetch_article(args.url, html_path, images_dir, concurrency=concurrency, cache_path=cache_path)
     print(f"Saved HTML to {html_path}")
     print(f"Images saved to {images_dir}")
 
@@ -0,0 +1,115 @@
+"""Helpers shared by update_filesystem.py and its optional output stages."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write text through a temporary file and a rename so readers never see a partial file."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def write_chunks_atomic(path: Path, chunks: Iterable[str]) -> None:
+    """Stream text chunks into path through a temporary file and a rename, like write_text_atomic."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path: Path, value: Any, **kwargs: Any) -> None:
+    """
+    Same bytes as write_text_atomic(path, json.dumps(value, **kwargs)), encoded while writing.
+
+    Never holds the whole document as one string. Meant for indented output, which the json
+    module encodes in Python either way; compact one-shot dumps are faster with the C encoder.
+    """
+    write_chunks_atomic(path, json.JSONEncoder(**kwargs).iterencode(value))
+
+
+def write_text_if_changed(path: Path, text: str) -> bool:
+    """Atomically write text unless path already holds exactly that text; return True if written."""
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(path, text)
+    return True
+
+
+def iter_nodes(data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every node of a built tree once.
+
+    Referenced folders share their "items" with the original folder, so the same dict can be
+    reachable from several places; annotating it once updates every occurrence.
+    """
+    seen = set()
+    stack = list(reversed(data["items"]))
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        stack.extend(reversed(node.get("items", [])))
+
+
+class FileCache:
+    """
+    JSON store of per-file results that stay valid while the file's mtime and size match.
+
+    Entries not looked up or stored since load() are dropped on save(), so the cache follows
+    the content tree as files are renamed or removed.
+    """
+
+    def __init__(self, path: Path, version: Any = 1) -> None:
+        self.path = path
+        self.version = version
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.version:
+            self.entries = data.get("entries", {})
+
+    def lookup(self, key: str, st: os.stat_result) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            return None
+        self.used[key] = entry
+        return entry["value"]
+
+    def store(self, key: str, st: os.stat_result, value: Any) -> None:
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "value": value}
+        self.entries[key] = self.used[key] = entry
+        self.dirty = True
+
+    def save(self) -> None:
+        """Persist the entries used since the previous save and start tracking anew."""
+        if self.dirty or self.used.keys() != self.entries.keys():
+            self.entries = dict(self.used)
+            data = {"version": self.version, "entries": self.entries}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self.path, json.dumps(data, ensure_ascii=False))
+        self.used = {}
+        self.dirty = False
@@ -0,0 +1,171 @@
+"""
+Small thread-safe HTTP client with per-host keep-alive connections, redirects and retries.
+
+Used by fetch_article.py so that downloading dozens of images from one host reuses a few
+connections instead of paying a TCP/TLS handshake per file.
+"""
+
+from __future__ import annotations
+
+import http.client
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+USER_AGENT = "fetch_article/1.0"
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_REDIRECTS = 5
+
+
+class HttpError(Exception):
+    def __init__(self, url: str, status: int, reason: str = "") -> None:
+        super().__init__(f"HTTP {status} {reason} for {url}".replace("  ", " "))
+        self.url = url
+        self.status = status
+
+
+HostKey = Tuple[str, str]
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections grouped by (scheme, host:port).
+
+    A connection is returned to its host's idle list only after its response was read to the
+    end, so a worker thread never picks up a connection with unread data.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_idle_per_host: int = 8,
+        user_agent: str = USER_AGENT,
+    ) -> None:
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_idle_per_host = max_idle_per_host
+        self.user_agent = user_agent
+        self.idle: Dict[HostKey, List[http.client.HTTPConnection]] = {}
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _acquire(self, key: HostKey) -> http.client.HTTPConnection:
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop()
+            self.connections_opened += 1
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _release(self, key: HostKey, conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(
+        self, method: str, url: str, headers: Dict[str, str]
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse, HostKey]:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        key = (parts.scheme, parts.netloc)
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        all_headers = {"User-Agent": self.user_agent, **headers}
+        # A pooled connection may have been closed by the server while idle; retry once on a fresh one.
+        for attempt in range(2):
+            conn = self._acquire(key)
+            try:
+                conn.request(method, target, headers=all_headers)
+                return conn, conn.getresponse(), key
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if attempt:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+        raise AssertionError("unreachable")
+
+    @contextmanager
+    def open(
+        self, url: str, method: str = "GET", headers: Optional[Dict[str, str]] = None
+    ) -> Iterator[Tuple[http.client.HTTPResponse, str]]:
+        """
+        Yield (response, final URL) after following redirects.
+
+        Connection errors and 429/5xx responses are retried with exponential backoff; other
+        statuses of 400 and above raise HttpError. 2xx and 304 responses are yielded.
+        """
+        headers = dict(headers or {})
+        redirects = 0
+        attempt = 0
+        while True:
+            try:
+                conn, resp, key = self._send(method, url, headers)
+            except (OSError, http.client.HTTPException):
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+
+            status = resp.status
+            if status in REDIRECT_STATUSES or status in RETRY_STATUSES or status >= 400:
+                resp.read()
+                self._finish(key, conn, resp)
+                location = resp.getheader("Location")
+                if status in REDIRECT_STATUSES and location and redirects < MAX_REDIRECTS:
+                    url = urllib.parse.urljoin(url, location)
+                    redirects += 1
+                    if status == 303:
+                        method = "GET"
+                    continue
+                if status in RETRY_STATUSES and attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+                    attempt += 1
+                    continue
+                raise HttpError(url, status, resp.reason)
+
+            try:
+                yield resp, url
+            except BaseException:
+                conn.close()
+                raise
+            self._finish(key, conn, resp)
+            return
+
+    def _finish(self, key: HostKey, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        if resp.isclosed() and not resp.will_close:
+            self._release(key, conn)
+        else:
+            conn.close()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> bytes:
+        with self.open(url, headers=headers) as (resp, _):
+            return resp.read()
+
+    def close(self) -> None:
+        with self.lock:
+            idle = [conn for conns in self.idle.values() for conn in conns]
+            self.idle.clear()
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,191 @@
+"""
+Validation of local article targets and external .url links (--validate).
+
+Local targets of .md/.html documents (see asset_manifest.document_refs) are looked up with exact
+case, as a case-sensitive static host would, in the directory listings of the generator's scan;
+only folders the build does not read (e.g. images/) are listed here. External .url targets
+are checked with HEAD (falling back to GET) over a bounded thread pool sharing keep-alive
+connections; successful results are cached for a TTL, failures are checked again next run.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from asset_manifest import document_ref_lists
+from fs_util import iter_nodes, write_text_atomic
+from http_pool import ConnectionPool, HttpError
+
+
+LINK_CACHE_VERSION = 1
+USER_AGENT = "update_filesystem/1.0 (link check)"
+
+
+class PathIndex:
+    """
+    Exact-case existence checks below root, backed by one listing per directory.
+
+    listings ({directory relative to root, "" for root: names}) seeds the index, typically
+    with the listings of the build's scan; other directories are listed on first use.
+    """
+
+    def __init__(self, root: Path, listings: Optional[Dict[str, List[str]]] = None) -> None:
+        self.root = root
+        self.listings: Dict[str, Optional[List[str]]] = dict(listings or {})
+
+    def _listing(self, rel_dir: str) -> Optional[List[str]]:
+        if rel_dir not in self.listings:
+            try:
+                self.listings[rel_dir] = os.listdir(self.root / rel_dir)
+            except OSError:
+                self.listings[rel_dir] = None
+        return self.listings[rel_dir]
+
+    def resolve(self, rel_path: str) -> Tuple[bool, Optional[str]]:
+        """
+        (True, None) if rel_path exists as written, (False, actual) if it exists only with a
+        different case, (False, None) if it does not exist at all.
+        """
+        exact = True
+        actual: List[str] = []
+        for part in [part for part in rel_path.split("/") if part]:
+            names = self._listing("/".join(actual))
+            if names is None:
+                return False, None
+            if part not in names:
+                matches = [name for name in names if name.lower() == part.lower()]
+                if not matches:
+                    return False, None
+                exact = False
+                part = matches[0]
+            actual.append(part)
+        return (True, None) if exact else (False, "/".join(actual))
+
+
+def validate_local(
+    data: Dict[str, Any],
+    root: Path,
+    refs_cache_path: Path,
+    listings: Optional[Dict[str, List[str]]] = None,
+) -> List[str]:
+    """Errors for local targets of documents that do not exist (or only with another case)."""
+    ref_lists, _ = document_ref_lists(data, root, refs_cache_path)
+    index = PathIndex(root, listings)
+    errors: List[str] = []
+    for rel_path, refs in ref_lists.items():
+        for target, _ in refs:
+            exists, actual = index.resolve(target)
+            if actual is not None:
+                errors.append(f"Link error in {rel_path}: '{target}' exists only as '{actual}'")
+            elif not exists:
+                errors.append(f"Link error in {rel_path}: '{target}' does not exist")
+    return errors
+
+
+class LinkCache:
+    """{url: {"checked", "ok", "detail"}} in a JSON file; only successful results are reused."""
+
+    def __init__(self, path: Path, ttl: float) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == LINK_CACHE_VERSION:
+            self.entries = data.get("urls", {})
+
+    def fresh(self, url: str, now: float) -> bool:
+        entry = self.entries.get(url)
+        return entry is not None and entry["ok"] and now - entry["checked"] < self.ttl
+
+    def store(self, url: str, now: float, ok: bool, detail: str) -> None:
+        self.entries[url] = {"checked": now, "ok": ok, "detail": detail}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": LINK_CACHE_VERSION, "urls": self.entries}
+        write_text_atomic(self.path, json.dumps(data, indent=1, ensure_ascii=False))
+
+
+def check_url(pool: ConnectionPool, url: str) -> Tuple[bool, str]:
+    """(reachable, detail); servers that refuse HEAD get a GET whose body is not read."""
+    try:
+        with pool.open(url, "HEAD") as (resp, _):
+            return True, str(resp.status)
+    except HttpError:
+        pass
+    except (OSError, ValueError) as exc:
+        return False, str(exc) or type(exc).__name__
+    try:
+        with pool.open(url, "GET") as (resp, _):
+            return True, str(resp.status)
+    except HttpError as exc:
+        return False, f"HTTP {exc.status}"
+    except (OSError, ValueError) as exc:
+        return False, str(exc) or type(exc).__name__
+
+
+def check_urls(
+    urls: List[str],
+    cache: LinkCache,
+    concurrency: int = 8,
+    timeout: float = 15.0,
+    now: Optional[float] = None,
+) -> Tuple[Dict[str, Tuple[bool, str]], int]:
+    """
+    Result of every URL, checking those without a fresh cached success concurrently.
+
+    Returns ({url: (ok, detail)}, URLs checked over the network).
+    """
+    now = time.time() if now is None else now
+    results = {url: (True, cache.entries[url]["detail"]) for url in urls if cache.fresh(url, now)}
+    pending = [url for url in urls if url not in results]
+    if pending:
+        with ConnectionPool(timeout=timeout, retries=1, user_agent=USER_AGENT) as pool:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                for url, result in zip(pending, executor.map(lambda url: check_url(pool, url), pending)):
+                    results[url] = result
+                    cache.store(url, now, *result)
+    return results, len(pending)
+
+
+def validate_links(
+    data: Dict[str, Any],
+    root: Path,
+    refs_cache_path: Path,
+    link_cache_path: Path,
+    external: bool = True,
+    ttl_hours: float = 168.0,
+    concurrency: int = 8,
+    listings: Optional[Dict[str, List[str]]] = None,
+) -> Tuple[List[str], int]:
+    """
+    Validate local document targets and, if external, every .url target.
+
+    listings are the scan's directory listings (see PathIndex). Returns (error messages, URLs
+    checked over the network).
+    """
+    errors = validate_local(data, root, refs_cache_path, listings)
+    if not external:
+        return errors, 0
+    url_files: Dict[str, List[str]] = {}
+    for node in iter_nodes(data):
+        if "url" in node and node["path"] not in url_files.get(node["url"], []):
+            url_files.setdefault(node["url"], []).append(node["path"])
+    cache = LinkCache(link_cache_path, ttl_hours * 3600)
+    results, checked = check_urls(sorted(url_files), cache, concurrency)
+    cache.entries = {url: entry for url, entry in cache.entries.items() if url in url_files}
+    cache.save()
+    for url in sorted(url_files):
+        ok, detail = results[url]
+        if not ok:
+            for rel_path in url_files[url]:
+                errors.append(f"URL error in {rel_path}: '{url}' is not reachable ({detail})")
+    return errors, checked
@@ -0,0 +1,364 @@
+"""
+Python port of markdownToHtml from src/util.ts, used to pre-render WordPad documents at build time.
+
+The port follows the TypeScript implementation line by line, including JavaScript's notion of
+whitespace for trim() and \\s, so a pre-rendered artifact matches what the WordPad app would
+produce in the browser. Keep both implementations in sync.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Match, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes, write_text_atomic
+
+
+RENDER_DIR_NAME = "filesystem.rendered"
+
+# Characters matched by \s and stripped by trim() in JavaScript.
+JS_WHITESPACE = "\t\n\x0b\x0c\r \xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+_S = "[" + re.escape(JS_WHITESPACE) + "]"
+# JavaScript "." does not match any line terminator.
+_DOT = "[^\n\r\u2028\u2029]"
+
+RAW_IMG_RE = re.compile(rf"<img{_S}+[^>]*src{_S}*={_S}*[\"']([^\"']+)[\"'][^>]*>", re.IGNORECASE)
+ALIGN_RE = re.compile(rf"align{_S}*={_S}*[\"']?{_S}*(left|right|center){_S}*[\"']?", re.IGNORECASE)
+IMAGE_RE = re.compile(r"!\[([\s\S]*?)\]\(([^)]+)\)")
+LINK_RE = re.compile(r"\[([^\[]*)\]\(([^)]+)\)")
+INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+STRONG_STAR_RE = re.compile(r"\*\*([^*]+)\*\*")
+STRONG_UNDERSCORE_RE = re.compile(r"__([^_]+)__")
+EM_STAR_RE = re.compile(r"(^|[^*])\*([^*\n]+)\*(?!\*)")
+EM_UNDERSCORE_RE = re.compile(r"_([^_]+)_")
+YOUTUBE_RE = re.compile(r"(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})")
+ABSOLUTE_URL_RE = re.compile(r"^(https?:)?//", re.IGNORECASE)
+STRIP_PUBLIC_RE = re.compile(r"^public[\\/]", re.IGNORECASE)
+TRIPLE_INLINE_RE = re.compile(r"```([^\n`]+)```")
+CODE_BLOCK_RE = re.compile(r"```([\s\S]*?)```")
+LINE_SPLIT_RE = re.compile(r"\r?\n")
+HEADING_RE = re.compile(rf"^(#{{1,4}}){_S}+({_DOT}*)$")
+BLOCKQUOTE_RE = re.compile(rf"^>{_S}?({_DOT}*)$")
+LIST_ITEM_RE = re.compile(rf"^[*-]{_S}+({_DOT}*)$")
+SEPARATOR_CELL_RE = re.compile(rf"^(?:{_S}|[:-])+$")
+TOKEN_RES = {name: re.compile(rf"@@{name}-([0-9]+)@@") for name in ("INLINE", "RAWIMG", "INLINECODE", "CODEBLOCK")}
+
+
+def js_trim(value: str) -> str:
+    return value.strip(JS_WHITESPACE)
+
+
+def js_trim_end(value: str) -> str:
+    return value.rstrip(JS_WHITESPACE)
+
+
+def js_replace_first(value: str, search: str, replacement: str) -> str:
+    """String.prototype.replace with a string pattern, including $-patterns in the replacement."""
+    idx = value.find(search)
+    if idx < 0:
+        return value
+    before, after = value[:idx], value[idx + len(search):]
+    expanded = re.sub(
+        r"\$([$&`'])",
+        lambda m: {"$": "$", "&": search, "`": before, "'": after}[m.group(1)],
+        replacement,
+    )
+    return before + expanded + after
+
+
+def js_lookup(values: List[str], idx: str) -> str:
+    """values[Number(idx)] inside a template literal; missing entries render as "undefined"."""
+    position = int(idx)
+    return values[position] if position < len(values) else "undefined"
+
+
+def escape_html(value: str) -> str:
+    return (
+        value.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&#39;")
+    )
+
+
+def resolve_path(url: str, base_path: str) -> str:
+    if ABSOLUTE_URL_RE.match(url) or url.startswith("data:") or url.startswith("mailto:") or url.startswith("/"):
+        return url
+
+    def strip_public(value: str) -> str:
+        return STRIP_PUBLIC_RE.sub("", value, count=1)
+
+    normalized_base = strip_public(base_path).replace("\\", "/") if base_path else ""
+    resolved = normalized_base + re.sub(r"^\./", "", url, count=1)
+    resolved = strip_public(resolved).replace("\\", "/")
+    if not resolved.startswith("/"):
+        resolved = f"/{resolved}"
+    return resolved
+
+
+def youtube_embed(href: str) -> Optional[str]:
+    match = YOUTUBE_RE.search(href)
+    if match:
+        video_id = match.group(1)
+        return (
+            f'<iframe width="779" height="438" src="https://www.youtube.com/embed/{video_id}" frameborder="0" '
+            'allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" '
+            "allowfullscreen></iframe>"
+        )
+    return None
+
+
+def _restore(pattern_name: str, text: str, values: List[str], render: Callable[[str], str]) -> str:
+    return TOKEN_RES[pattern_name].sub(lambda m: render(m.group(1)) if int(m.group(1)) < len(values) else "", text)
+
+
+def apply_inline(text: str, base_path: str) -> str:
+    raw_image_tokens: List[str] = []
+
+    def raw_image(match: Match[str]) -> str:
+        src = match.group(1)
+        resolved = resolve_path(src, base_path)
+        align_match = ALIGN_RE.search(match.group(0))
+        align_class = f" align-{align_match.group(1).lower()}" if align_match else ""
+        raw_image_tokens.append(f'<div class="wp-img{align_class}">{js_replace_first(match.group(0), src, resolved)}</div>')
+        return f"@@RAWIMG-{len(raw_image_tokens) - 1}@@"
+
+    text = RAW_IMG_RE.sub(raw_image, text)
+    t = escape_html(text)
+
+    replacements: List[str] = []
+
+    def token_for(html: str) -> str:
+        replacements.append(html)
+        return f"@@INLINE-{len(replacements) - 1}@@"
+
+    def image(match: Match[str]) -> str:
+        alt, src = match.group(1), match.group(2)
+        resolved = resolve_path(src, base_path)
+        embed = youtube_embed(resolved)
+        if embed:
+            return token_for(f'<div class="wp-embed">{embed}</div>')
+        return token_for(f'<div class="wp-img"><img src="{resolved}" alt="{alt}" /></div>')
+
+    def link(match: Match[str]) -> str:
+        label, href = match.group(1), match.group(2)
+        resolved = resolve_path(href, base_path)
+        embed = youtube_embed(resolved)
+        if embed:
+            return token_for(embed)
+        return token_for(f'<a href="{resolved}" target="_blank" rel="noreferrer noopener">{label}</a>')
+
+    t = IMAGE_RE.sub(image, t)
+    t = LINK_RE.sub(link, t)
+    t = INLINE_CODE_RE.sub(lambda m: token_for(f"<code>{m.group(1)}</code>"), t)
+    t = STRONG_STAR_RE.sub(r"<strong>\1</strong>", t)
+    t = STRONG_UNDERSCORE_RE.sub(r"<strong>\1</strong>", t)
+    t = EM_STAR_RE.sub(r"\1<em>\2</em>", t)
+    t = EM_UNDERSCORE_RE.sub(r"<em>\1</em>", t)
+
+    t = _restore("INLINE", t, replacements, lambda idx: replacements[int(idx)])
+    t = _restore("RAWIMG", t, raw_image_tokens, lambda idx: raw_image_tokens[int(idx)])
+    return t
+
+
+def is_table_row(line: str) -> bool:
+    trimmed = js_trim(line)
+    return trimmed.startswith("|") and trimmed.endswith("|")
+
+
+def is_table_separator(line: str) -> bool:
+    trimmed = js_trim(line)
+    if not trimmed.startswith("|") or not trimmed.endswith("|"):
+        return False
+    cells = trimmed[1:-1].split("|")
+    return all(SEPARATOR_CELL_RE.match(cell) and "-" in cell for cell in cells)
+
+
+def parse_table_row(row: str) -> List[str]:
+    trimmed = js_trim(row)
+    return [js_trim(cell) for cell in trimmed[1:-1].split("|")]
+
+
+def parse_table(header_row: str, separator_row: str, body_rows: List[str], base_path: str) -> str:
+    header_cells = parse_table_row(header_row)
+    separator_cells = parse_table_row(separator_row)
+
+    alignments = []
+    for cell in separator_cells:
+        left = cell.startswith(":")
+        right = cell.endswith(":")
+        alignments.append("center" if left and right else "right" if right else "left")
+
+    def align(i: int) -> str:
+        return alignments[i] if i < len(alignments) and alignments[i] else "left"
+
+    html = "<table><thead><tr>"
+    for i, cell in enumerate(header_cells):
+        html += f'<th style="text-align:{align(i)}">{apply_inline(cell, base_path)}</th>'
+    html += "</tr></thead><tbody>"
+
+    for row in body_rows:
+        html += "<tr>"
+        for i, cell in enumerate(parse_table_row(row)):
+            html += f'<td style="text-align:{align(i)}">{apply_inline(cell, base_path)}</td>'
+        html += "</tr>"
+
+    html += "</tbody></table>"
+    return html
+
+
+def markdown_to_html(md: str, base_path: str) -> str:
+    inline_codes: List[str] = []
+
+    def inline_code(match: Match[str]) -> str:
+        inline_codes.append(escape_html(match.group(1)))
+        return f"@@INLINECODE-{len(inline_codes) - 1}@@"
+
+    md = TRIPLE_INLINE_RE.sub(inline_code, md)
+
+    code_blocks: List[str] = []
+
+    def code_block(match: Match[str]) -> str:
+        code_blocks.append(escape_html(js_trim(match.group(1))))
+        return f"@@CODEBLOCK-{len(code_blocks) - 1}@@"
+
+    md = CODE_BLOCK_RE.sub(code_block, md)
+
+    lines = LINE_SPLIT_RE.split(md)
+    parts: List[str] = []
+    list_open = False
+    block_quote_active = False
+    block_quote_lines: List[str] = []
+
+    def close_list() -> None:
+        nonlocal list_open
+        if list_open:
+            parts.append("</ul>")
+            list_open = False
+
+    def close_block_quote() -> None:
+        nonlocal block_quote_active, block_quote_lines
+        if block_quote_active:
+            parts.append(f"<blockquote>{'<br/>'.join(block_quote_lines)}</blockquote>")
+            block_quote_active = False
+            block_quote_lines = []
+
+    i = 0
+    while i < len(lines):
+        line = js_trim_end(lines[i])
+
+        if not js_trim(line):
+            close_list()
+            close_block_quote()
+            i += 1
+            continue
+
+        if is_table_row(line) and i + 1 < len(lines) and is_table_separator(lines[i + 1]):
+            close_list()
+            close_block_quote()
+            header_row = line
+            separator_row = lines[i + 1]
+            body_rows: List[str] = []
+            i += 2
+            while i < len(lines) and is_table_row(lines[i]):
+                body_rows.append(lines[i])
+                i += 1
+            parts.append(parse_table(header_row, separator_row, body_rows, base_path))
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            close_list()
+            close_block_quote()
+            level = len(heading.group(1))
+            parts.append(f"<h{level}>{apply_inline(heading.group(2), base_path)}</h{level}>")
+            i += 1
+            continue
+
+        quote = BLOCKQUOTE_RE.match(line)
+        if quote:
+            close_list()
+            block_quote_active = True
+            block_quote_lines.append(apply_inline(quote.group(1), base_path))
+            i += 1
+            continue
+
+        item = LIST_ITEM_RE.match(line)
+        if item:
+            if not list_open:
+                close_list()
+                close_block_quote()
+                list_open = True
+                parts.append("<ul>")
+            parts.append(f"<li>{apply_inline(item.group(1), base_path)}</li>")
+            i += 1
+            continue
+
+        close_list()
+        close_block_quote()
+        parts.append(f"<p>{apply_inline(line, base_path)}</p>")
+        i += 1
+    close_list()
+    close_block_quote()
+
+    html = "\n".join(parts)
+    html = TOKEN_RES["CODEBLOCK"].sub(lambda m: f"<pre><code>{js_lookup(code_blocks, m.group(1))}</code></pre>", html)
+    html = TOKEN_RES["INLINECODE"].sub(lambda m: f"<code>{js_lookup(inline_codes, m.group(1))}</code>", html)
+    html = TOKEN_RES["INLINE"].sub("", html)
+    html = TOKEN_RES["RAWIMG"].sub("", html)
+    return html
+
+
+def base_path_for(rel_path: str) -> str:
+    """basePath that WordPad passes to markdownToHtml for a document at /filesystem/<rel_path>."""
+    url = f"/filesystem/{rel_path}"
+    return url[: url.rfind("/") + 1]
+
+
+def render_markdown_items(data: Dict[str, Any], root: Path, out_dir: Path, cache_path: Path) -> Tuple[int, int]:
+    """
+    Render every wordpad item to out_dir/<path>.html and annotate the items.
+
+    Each wordpad node gets "rendered" (artifact path relative to /filesystem/) and "renderedHash"
+    (SHA-256 prefix of the markdown source). Sources whose mtime and size are unchanged, or whose
+    hash is unchanged, are not re-rendered. Returns (documents, artifacts written).
+    """
+    renderer_version = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+    cache = FileCache(cache_path, version=renderer_version)
+    rendered: Dict[str, Tuple[str, str]] = {}
+    written = 0
+
+    for node in iter_nodes(data):
+        if node["type"] != "wordpad":
+            continue
+        rel_path = node["path"]
+        if rel_path not in rendered:
+            source = root / rel_path
+            artifact = out_dir / f"{rel_path}.html"
+            st = source.stat()
+            source_hash = cache.lookup(rel_path, st)
+            if source_hash is None or not artifact.is_file():
+                # A touched source with the same content keeps its artifact.
+                previous_hash = cache.entries.get(rel_path, {}).get("value")
+                raw = source.read_bytes()
+                new_hash = hashlib.sha256(raw).hexdigest()[:16]
+                if new_hash != previous_hash or not artifact.is_file():
+                    # fetch().text() in the browser drops a UTF-8 BOM as well.
+                    html = markdown_to_html(raw.decode("utf-8-sig", errors="replace"), base_path_for(rel_path))
+                    artifact.parent.mkdir(parents=True, exist_ok=True)
+                    write_text_atomic(artifact, html)
+                    written += 1
+                source_hash = new_hash
+                cache.store(rel_path, st, source_hash)
+            rendered[rel_path] = (f"{RENDER_DIR_NAME}/{rel_path}.html", source_hash)
+        node["rendered"], node["renderedHash"] = rendered[rel_path]
+
+    expected = {out_dir / f"{rel_path}.html" for rel_path in rendered}
+    for path in out_dir.rglob("*.html") if out_dir.is_dir() else []:
+        if path not in expected:
+            path.unlink()
+    cache.save()
+    return len(rendered), written
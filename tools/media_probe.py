@@ -0,0 +1,299 @@
+"""
+Header-only probing of image dimensions and audio duration for the filesystem tree.
+
+Every probe reads a bounded number of bytes from the start of the file (and, for Ogg, from its
+end), never the whole file. Supported containers: PNG, GIF, JPEG, WebP, WAV, MP3, Ogg
+(Vorbis/Opus) and FLAC. Unknown or damaged files simply produce no metadata.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes
+
+
+HEAD_SIZE = 64 * 1024
+OGG_TAIL_SIZE = 64 * 1024
+
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Keyed by the 2-bit version field: 0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1.
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# JPEG start-of-frame markers (all SOFn except DHT, JPG and DAC).
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def probe_png(head: bytes) -> Optional[Dict[str, Any]]:
+    if head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return {"width": width, "height": height}
+
+
+def probe_gif(head: bytes) -> Optional[Dict[str, Any]]:
+    if head[:6] not in (b"GIF87a", b"GIF89a"):
+        return None
+    width, height = struct.unpack("<HH", head[6:10])
+    return {"width": width, "height": height}
+
+
+def probe_webp(head: bytes) -> Optional[Dict[str, Any]]:
+    if head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return {"width": width & 0x3FFF, "height": height & 0x3FFF}
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return {"width": (bits & 0x3FFF) + 1, "height": ((bits >> 14) & 0x3FFF) + 1}
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return {"width": width, "height": height}
+    return None
+
+
+def exif_orientation(segment: bytes) -> int:
+    """Orientation tag (1-8) from an APP1 Exif segment payload, 1 when absent."""
+    if segment[:6] != b"Exif\x00\x00":
+        return 1
+    tiff = segment[6:]
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None or len(tiff) < 8:
+        return 1
+    ifd_offset = struct.unpack(f"{endian}I", tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    (count,) = struct.unpack(f"{endian}H", tiff[ifd_offset:ifd_offset + 2])
+    for idx in range(count):
+        entry = ifd_offset + 2 + idx * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, _, _, value = struct.unpack(f"{endian}HHIH", tiff[entry:entry + 10])
+        if tag == 0x0112:
+            return value
+    return 1
+
+
+def probe_jpeg(f: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Walk JPEG segments with seeks until the frame header; only segment headers are read."""
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        return None
+    orientation = 1
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            # Orientations 5-8 rotate by 90 degrees; browsers apply them when displaying.
+            if orientation >= 5:
+                width, height = height, width
+            return {"width": width, "height": height}
+        if marker == 0xE1 and orientation == 1:
+            orientation = exif_orientation(f.read(length - 2))
+            continue
+        if marker == 0xDA:
+            return None
+        f.seek(length - 2, 1)
+
+
+def audio_result(duration: float, audio_bytes: int) -> Optional[Dict[str, Any]]:
+    if duration <= 0:
+        return None
+    return {"duration": round(duration, 3), "bitrate": round(audio_bytes * 8 / duration / 1000)}
+
+
+def probe_wav(head: bytes) -> Optional[Dict[str, Any]]:
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    offset = 12
+    byte_rate = 0
+    while offset + 8 <= len(head):
+        chunk_id, chunk_size = struct.unpack("<4sI", head[offset:offset + 8])
+        if chunk_id == b"fmt " and offset + 16 <= len(head):
+            byte_rate = struct.unpack("<I", head[offset + 16:offset + 20])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            return {"duration": round(chunk_size / byte_rate, 3), "bitrate": round(byte_rate * 8 / 1000)}
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def probe_flac(head: bytes, file_size: int) -> Optional[Dict[str, Any]]:
+    if head[:4] != b"fLaC" or head[4] & 0x7F != 0:
+        return None
+    info = head[8:8 + 34]
+    if len(info) < 18:
+        return None
+    bits = int.from_bytes(info[10:18], "big")
+    sample_rate = bits >> 44
+    total_samples = bits & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        return None
+    return audio_result(total_samples / sample_rate, file_size)
+
+
+def probe_ogg(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict[str, Any]]:
+    if head[:4] != b"OggS":
+        return None
+    segments = head[26]
+    packet = head[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        pre_skip = 0
+    elif packet[:8] == b"OpusHead":
+        sample_rate = 48000
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+    else:
+        return None
+    f.seek(max(0, file_size - OGG_TAIL_SIZE))
+    tail = f.read(OGG_TAIL_SIZE)
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+    return audio_result((granule - pre_skip) / sample_rate, file_size)
+
+
+def mp3_frame_header(data: bytes, offset: int) -> Optional[Tuple[int, int, int, int, int]]:
+    """(version, layer, bitrate kbps, sample rate, channel mode) of a valid frame header at offset."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = 4 - ((data[offset + 1] >> 1) & 0x03)
+    bitrate_idx = data[offset + 2] >> 4
+    rate_idx = (data[offset + 2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    table = MP3_BITRATES[(1 if version == 3 else 2, layer)]
+    return version, layer, table[bitrate_idx], MP3_SAMPLE_RATES[version][rate_idx], data[offset + 3] >> 6
+
+
+def probe_mp3(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict[str, Any]]:
+    start = 0
+    if head[:3] == b"ID3" and len(head) >= 10:
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        start = 10 + size + (10 if head[5] & 0x10 else 0)
+        f.seek(start)
+        head = f.read(HEAD_SIZE)
+
+    offset = 0
+    header = None
+    while offset < len(head) - 4:
+        header = mp3_frame_header(head, offset)
+        if header:
+            break
+        offset += 1
+    if not header:
+        return None
+    version, layer, bitrate, sample_rate, channel_mode = header
+    audio_start = start + offset
+    end = file_size
+    f.seek(max(0, file_size - 128))
+    if f.read(3) == b"TAG":
+        end -= 128
+    audio_bytes = end - audio_start
+
+    samples_per_frame = 384 if layer == 1 else 1152 if layer == 2 or version == 3 else 576
+    side_info = (32 if channel_mode != 3 else 17) if version == 3 else (17 if channel_mode != 3 else 9)
+    xing = offset + 4 + side_info
+    frames = None
+    if head[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", head[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", head[xing + 8:xing + 12])[0]
+    elif head[offset + 36:offset + 40] == b"VBRI":
+        frames = struct.unpack(">I", head[offset + 50:offset + 54])[0]
+
+    if frames:
+        return audio_result(frames * samples_per_frame / sample_rate, audio_bytes)
+    return audio_result(audio_bytes * 8 / (bitrate * 1000), audio_bytes)
+
+
+def probe_file(path: Path) -> Optional[Dict[str, Any]]:
+    """Width/height of an image or duration/bitrate of a sound file, from its headers only."""
+    suffix = path.suffix.lower()
+    file_size = path.stat().st_size
+    with path.open("rb") as f:
+        head = f.read(HEAD_SIZE)
+        try:
+            if suffix == ".png":
+                return probe_png(head)
+            if suffix == ".gif":
+                return probe_gif(head)
+            if suffix == ".webp":
+                return probe_webp(head)
+            if suffix in (".jpg", ".jpeg"):
+                return probe_jpeg(f)
+            if suffix == ".wav":
+                return probe_wav(head)
+            if suffix == ".flac":
+                return probe_flac(head, file_size)
+            if suffix == ".ogg":
+                return probe_ogg(f, head, file_size)
+            if suffix == ".mp3":
+                return probe_mp3(f, head, file_size)
+        except (struct.error, IndexError, ValueError, OSError):
+            return None
+    return None
+
+
+def probe_media_items(data: Dict[str, Any], root: Path, cache_path: Path) -> Tuple[int, int]:
+    """
+    Add width/height to image items and duration/bitrate to sound items.
+
+    Results are cached by mtime and size. Returns (items with metadata, files probed).
+    """
+    probe_version = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+    cache = FileCache(cache_path, version=probe_version)
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    probed = 0
+    annotated = 0
+    for node in iter_nodes(data):
+        if node["type"] not in ("image", "sound"):
+            continue
+        rel_path = node["path"]
+        if rel_path not in results:
+            path = root / rel_path
+            st = path.stat()
+            # Cached as a one-element list so "probed, nothing found" is distinguishable from a miss.
+            cached = cache.lookup(rel_path, st)
+            if cached is None:
+                cached = [probe_file(path)]
+                cache.store(rel_path, st, cached)
+                probed += 1
+            results[rel_path] = cached[0]
+        if results[rel_path]:
+            node.update(results[rel_path])
+            annotated += 1
+    cache.save()
+    return annotated, probed
@@ -0,0 +1,155 @@
+"""
+Precompressed sidecars of the generator output and of text-like items.
+
+The manifest gets .gz (and .br) next to it; wordpad, notepad and html items get them under
+filesystem.compressed/<source path>.gz, so a static host can serve the smallest encoding
+without compressing per request. Compression runs in a process pool at the maximum level and
+is skipped for sources whose SHA-256 did not change. The brotli module is optional: without
+it only .gz files are written.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+COMPRESSED_DIR_NAME = "filesystem.compressed"
+COMPRESS_VERSION = 1
+SIDECAR_SUFFIXES = (".gz", ".br")
+TEXT_TYPES = {"wordpad", "notepad", "html"}
+
+
+def sidecar_formats() -> List[str]:
+    return ["gz", "br"] if brotli is not None else ["gz"]
+
+
+def minified_path(output_path: Path) -> Path:
+    """"filesystem.json" -> "filesystem.min.json"."""
+    return output_path.with_name(f"{output_path.stem}.min{output_path.suffix}")
+
+
+def compress_data(data: bytes, fmt: str) -> bytes:
+    if fmt == "br":
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the .gz bytes stable across runs.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_file(
+    src: str, dst_base: str, formats: List[str], known_hash: Optional[str], known_written: List[str]
+) -> Tuple[str, List[str], bool]:
+    """
+    Write dst_base.<fmt> for every format that is smaller than src; runs in a worker process.
+
+    Nothing is written when src still hashes to known_hash and its sidecars exist. Returns
+    (SHA-256 of src, formats written, whether anything was compressed).
+    """
+    with open(src, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash and all(os.path.isfile(f"{dst_base}.{fmt}") for fmt in known_written):
+        return digest, known_written, False
+    os.makedirs(os.path.dirname(dst_base), exist_ok=True)
+    written = []
+    for fmt in formats:
+        packed = compress_data(data, fmt)
+        # Tiny files gain nothing; a host would serve the larger sidecar anyway.
+        if len(packed) < len(data):
+            dst = f"{dst_base}.{fmt}"
+            tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(packed)
+            os.replace(tmp, dst)
+            written.append(fmt)
+    for suffix in SIDECAR_SUFFIXES:
+        if suffix[1:] not in written and os.path.exists(dst_base + suffix):
+            os.unlink(dst_base + suffix)
+    return digest, written, True
+
+
+def remove_stale_sidecars(out_dir: Path, keep: set) -> None:
+    for dirpath, _, filenames in os.walk(out_dir, topdown=False):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if path.relative_to(out_dir).as_posix() not in keep:
+                path.unlink()
+        if dirpath != str(out_dir) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def precompress_outputs(
+    data: Dict[str, Any],
+    root: Path,
+    outputs: List[Path],
+    out_dir: Path,
+    cache_path: Path,
+    jobs: int = 1,
+) -> Tuple[int, int]:
+    """
+    Write sidecars for every output file (next to it) and every text-like item (under out_dir).
+
+    Sources are read only when their mtime or size changed since the cached entry, and
+    compressed only when their content hash changed too. Returns (sources, sources compressed).
+    """
+    formats = sidecar_formats()
+    cache = FileCache(cache_path, version=[COMPRESS_VERSION, formats])
+    sources: Dict[str, Tuple[Path, Path]] = {}
+    for path in outputs:
+        sources[path.name] = (path, path)
+    for node in iter_nodes(data):
+        if node["type"] in TEXT_TYPES:
+            rel_path = node["path"]
+            sources[f"{COMPRESSED_DIR_NAME}/{rel_path}"] = (root / rel_path, out_dir / rel_path)
+
+    results: Dict[str, List[str]] = {}
+    pending: List[Tuple[str, os.stat_result, Optional[Dict[str, Any]]]] = []
+    for key, (src, dst_base) in sources.items():
+        st = src.stat()
+        cached = cache.lookup(key, st)
+        if cached is not None and all(Path(f"{dst_base}.{fmt}").is_file() for fmt in cached["written"]):
+            results[key] = cached["written"]
+        else:
+            # A rewritten source with the same content (e.g. the manifest) keeps its sidecars.
+            previous = cache.entries.get(key, {}).get("value")
+            pending.append((key, st, previous))
+
+    compressed = 0
+    if pending:
+        args = []
+        for key, _, previous in pending:
+            src, dst_base = sources[key]
+            known_hash = previous["hash"] if previous else None
+            known_written = previous["written"] if previous else []
+            args.append((str(src), str(dst_base), formats, known_hash, known_written))
+        if len(args) > 1 and jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                outcomes = list(pool.map(compress_file, *zip(*args), chunksize=4))
+        else:
+            outcomes = [compress_file(*arg) for arg in args]
+        for (key, st, _), (digest, written, did_compress) in zip(pending, outcomes):
+            cache.store(key, st, {"hash": digest, "written": written})
+            results[key] = written
+            compressed += did_compress
+
+    keep = {
+        f"{Path(key).relative_to(COMPRESSED_DIR_NAME).as_posix()}.{fmt}"
+        for key, written in results.items()
+        if key.startswith(f"{COMPRESSED_DIR_NAME}/")
+        for fmt in written
+    }
+    if out_dir.is_dir():
+        remove_stale_sidecars(out_dir, keep)
+    cache.save()
+    return len(sources), compressed
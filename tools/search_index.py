@@ -0,0 +1,136 @@
+"""
+Build-time full-text search index over the .md and .txt documents of the filesystem tree.
+
+The index lives in filesystem.search/ next to filesystem.json:
+
+  index.json      {"version", "prefix", "docs": [{"path", "name", "sections": [{"title"}]}],
+                   "shards": {term prefix: shard file}}
+  <prefix>.json   {term: [[doc, section, count], ...]} for every term starting with that prefix
+
+A client lowercases and tokenizes the query the same way, fetches index.json once and then only
+the shards of the query terms' prefixes. Shard file names are the hex UTF-8 bytes of the prefix.
+Sections carry no anchor: neither markdownToHtml nor the pre-rendered HTML gives headings an id,
+so a client locates a section by its heading title (the first section is untitled).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from fs_util import FileCache, iter_nodes, write_text_if_changed
+
+
+SEARCH_DIR_NAME = "filesystem.search"
+INDEX_VERSION = 2
+PREFIX_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+SEARCHABLE_SUFFIXES = {".md", ".txt"}
+
+# Same heading syntax as markdownToHtml in src/util.ts.
+HEADING_RE = re.compile(r"^(#{1,4})\s+(.*)$")
+IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+LINK_RE = re.compile(r"\[([^\[\]]*)\]\([^)]*\)")
+TAG_RE = re.compile(r"<[^>]+>")
+URL_RE = re.compile(r"https?://\S+")
+TOKEN_RE = re.compile(r"[^\W_]{2,}")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of at least two letters or digits; markup and URLs are dropped."""
+    text = IMAGE_RE.sub(r"\1", text)
+    text = LINK_RE.sub(r"\1", text)
+    text = TAG_RE.sub(" ", text)
+    text = URL_RE.sub(" ", text)
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def split_sections(text: str, is_markdown: bool) -> List[Tuple[str, str]]:
+    """Split a document into (title, body) sections at markdown headings; the first is untitled."""
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    in_code = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = HEADING_RE.match(line.rstrip()) if is_markdown and not in_code else None
+        if match:
+            title = match.group(2).strip()
+            sections.append((title, [title]))
+        else:
+            sections[-1][1].append(line)
+    return [(title, "\n".join(lines)) for title, lines in sections]
+
+
+def index_document(text: str, is_markdown: bool) -> Dict[str, Any]:
+    """Sections and per-section term counts of one document."""
+    sections: List[Dict[str, str]] = []
+    terms: Dict[str, List[List[int]]] = {}
+    for position, (title, body) in enumerate(split_sections(text, is_markdown)):
+        counts: Dict[str, int] = {}
+        for token in tokenize(body):
+            counts[token] = counts.get(token, 0) + 1
+        if not counts and position == 0:
+            continue
+        section_idx = len(sections)
+        sections.append({"title": title})
+        for term, count in counts.items():
+            terms.setdefault(term, []).append([section_idx, count])
+    return {"sections": sections, "terms": terms}
+
+
+def read_document(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8")
+    except UnicodeDecodeError:
+        return path.read_text(encoding="utf-8", errors="replace")
+
+
+def shard_name(prefix: str) -> str:
+    return f"{prefix.encode('utf-8').hex()}.json"
+
+
+def build_search_index(data: Dict[str, Any], root: Path, out_dir: Path, cache_path: Path) -> Tuple[int, int]:
+    """
+    Index every searchable item of the built tree into out_dir.
+
+    Documents whose mtime and size are unchanged reuse their cached term counts, and shards are
+    only rewritten when their content changes. Returns (indexed documents, shards written).
+    """
+    cache = FileCache(cache_path, version=INDEX_VERSION)
+    documents: Dict[str, str] = {}
+    for node in iter_nodes(data):
+        if node["type"] in ("wordpad", "notepad") and Path(node["path"]).suffix.lower() in SEARCHABLE_SUFFIXES:
+            documents.setdefault(node["path"], node["name"])
+
+    docs: List[Dict[str, Any]] = []
+    postings: Dict[str, List[List[int]]] = {}
+    for doc_idx, rel_path in enumerate(sorted(documents)):
+        path = root / rel_path
+        st = path.stat()
+        entry = cache.lookup(rel_path, st)
+        if entry is None:
+            entry = index_document(read_document(path), path.suffix.lower() == ".md")
+            cache.store(rel_path, st, entry)
+        docs.append({"path": rel_path, "name": documents[rel_path], "sections": entry["sections"]})
+        for term, hits in entry["terms"].items():
+            postings.setdefault(term, []).extend([doc_idx, section, count] for section, count in hits)
+
+    shards: Dict[str, Dict[str, List[List[int]]]] = {}
+    for term in sorted(postings):
+        shards.setdefault(term[:PREFIX_LENGTH], {})[term] = postings[term]
+    shard_names = {prefix: shard_name(prefix) for prefix in shards}
+
+    written = 0
+    for prefix, shard in shards.items():
+        text = json.dumps(shard, ensure_ascii=False, separators=(",", ":"))
+        if write_text_if_changed(out_dir / shard_names[prefix], text):
+            written += 1
+    index = {"version": INDEX_VERSION, "prefix": PREFIX_LENGTH, "docs": docs, "shards": shard_names}
+    write_text_if_changed(out_dir / "index.json", json.dumps(index, ensure_ascii=False, separators=(",", ":")))
+    for path in out_dir.glob("*.json"):
+        if path.name != "index.json" and path.name not in shard_names.values():
+            path.unlink()
+    cache.save()
+    return len(docs), written
@@ -0,0 +1,178 @@
+"""
+Downscaled derivatives of folder images, image items and article images.
+
+Variants are written to filesystem.thumbs/<source path>.<size>.<ext> next to the output and
+listed on the nodes of the built tree. Pillow is optional: without it the stage is skipped.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fs_util import FileCache, iter_nodes
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+    ImageOps = None
+
+
+THUMB_DIR_NAME = "filesystem.thumbs"
+THUMB_VERSION = 2
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+ARTICLE_IMAGES_DIR = "images"
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+def variant_formats(suffix: str, webp: bool) -> List[str]:
+    """Output extensions for a source: its own format family, plus WebP if requested."""
+    base = {".jpg": "jpg", ".jpeg": "jpg", ".webp": "webp"}.get(suffix, "png")
+    formats = [base]
+    if webp and base != "webp":
+        formats.append("webp")
+    return formats
+
+
+def variant_path(rel_path: str, size: int, fmt: str) -> str:
+    return f"{THUMB_DIR_NAME}/{rel_path}.{size}.{fmt}"
+
+
+def make_variant(src: str, dst: str, size: int, fmt: str) -> Tuple[int, int]:
+    """Write a copy of src that fits in size x size pixels; runs in a worker process."""
+    with Image.open(src) as img:
+        img.seek(0)
+        # Saved variants carry no EXIF, so apply a camera's Orientation tag to the pixels, as
+        # media_probe does for the reported width and height. Returns a detached copy.
+        img = ImageOps.exif_transpose(img)
+    img.thumbnail((size, size), Image.LANCZOS)
+    if fmt == "jpg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif fmt in ("png", "webp") and img.mode == "P":
+        img = img.convert("RGBA")
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.tmp")
+    if fmt == "jpg":
+        img.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == "webp":
+        img.save(tmp, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        img.save(tmp, "PNG", optimize=True)
+    os.replace(tmp, dst)
+    return img.width, img.height
+
+
+def collect_sources(data: Dict[str, Any], root: Path) -> Dict[str, List[Tuple[Dict[str, Any], str, Optional[str]]]]:
+    """
+    Map every source image to the nodes that should list its variants.
+
+    Each target is (node, property, key): image items get "variants", folders get
+    "imageVariants" for their folder_image and "articleImageVariants"[name] for images/ files.
+    """
+    sources: Dict[str, List[Tuple[Dict[str, Any], str, Optional[str]]]] = {}
+    for node in iter_nodes(data):
+        rel_path = node["path"]
+        if node["type"] == "image" and Path(rel_path).suffix.lower() in IMAGE_SUFFIXES:
+            sources.setdefault(rel_path, []).append((node, "variants", None))
+        if node["type"] != "folder":
+            continue
+        if "image" in node:
+            sources.setdefault(f"{rel_path}/{node['image']}", []).append((node, "imageVariants", None))
+        images_dir = root / rel_path / ARTICLE_IMAGES_DIR
+        if images_dir.is_dir():
+            for entry in sorted(os.scandir(images_dir), key=lambda e: e.name):
+                if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_SUFFIXES:
+                    name = f"{ARTICLE_IMAGES_DIR}/{entry.name}"
+                    sources.setdefault(f"{rel_path}/{name}", []).append((node, "articleImageVariants", name))
+    return sources
+
+
+def remove_stale_variants(out_dir: Path, keep: set) -> None:
+    for dirpath, dirnames, filenames in os.walk(out_dir, topdown=False):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if path.relative_to(out_dir.parent).as_posix() not in keep:
+                path.unlink()
+        if dirpath != str(out_dir) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+
+def build_thumbnails(
+    data: Dict[str, Any],
+    root: Path,
+    out_dir: Path,
+    cache_path: Path,
+    size: int,
+    webp: bool = False,
+    jobs: int = 1,
+) -> Optional[Tuple[int, int]]:
+    """
+    Create missing or outdated variants across a process pool and list them on the tree.
+
+    A variant is up to date when the source mtime and size match the cached entry and the
+    output file still exists. Variants that are not smaller than the source are dropped.
+    Returns (variants listed, variants written), or None when Pillow is not installed.
+    """
+    if Image is None:
+        return None
+    cache = FileCache(cache_path, version=[THUMB_VERSION, size, webp])
+    sources = collect_sources(data, root)
+    variants: Dict[str, List[Dict[str, Any]]] = {}
+    pending = []
+    for rel_path in sorted(sources):
+        src = root / rel_path
+        st = src.stat()
+        cached = cache.lookup(rel_path, st)
+        if cached is not None and all((out_dir.parent / v["path"]).is_file() for v in cached):
+            variants[rel_path] = cached
+        else:
+            pending.append((rel_path, st))
+
+    written = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {}
+            for rel_path, st in pending:
+                for fmt in variant_formats(Path(rel_path).suffix.lower(), webp):
+                    dst = out_dir.parent / variant_path(rel_path, size, fmt)
+                    futures[(rel_path, fmt)] = pool.submit(make_variant, str(root / rel_path), str(dst), size, fmt)
+            for rel_path, st in pending:
+                entries = []
+                for fmt in variant_formats(Path(rel_path).suffix.lower(), webp):
+                    try:
+                        width, height = futures[(rel_path, fmt)].result()
+                    except Exception as exc:
+                        # Decoders raise more than OSError/ValueError (e.g. DecompressionBombError);
+                        # one bad image must not abort the stage.
+                        print(f"Cannot create {fmt} variant of {rel_path}: {type(exc).__name__}: {exc}", file=sys.stderr)
+                        continue
+                    path = variant_path(rel_path, size, fmt)
+                    size_bytes = (out_dir.parent / path).stat().st_size
+                    if size_bytes >= st.st_size:
+                        # Small originals gain nothing from a derivative.
+                        (out_dir.parent / path).unlink()
+                        continue
+                    entries.append({"path": path, "width": width, "height": height, "size": size_bytes})
+                    written += 1
+                cache.store(rel_path, st, entries)
+                variants[rel_path] = entries
+
+    listed = 0
+    for rel_path, targets in sources.items():
+        entries = variants.get(rel_path)
+        if not entries:
+            continue
+        listed += len(entries)
+        for node, prop, key in targets:
+            if key is None:
+                node[prop] = entries
+            else:
+                node.setdefault(prop, {})[key] = entries
+    remove_stale_variants(out_dir, {v["path"] for entries in variants.values() for v in entries})
+    cache.save()
+    return listed, written
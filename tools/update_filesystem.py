@@ -1,20 +1,172 @@
 from __future__ import annotations
 
 import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import ctypes
+import ctypes.util
+import hashlib
+import itertools
 import json
+import os
 from pathlib import Path
+import select
+import struct
 import sys
+import time
 import zipfile
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 from urllib.parse import urlparse
 
+from archive_manifest import ARCHIVE_DIR_NAME, build_archive_manifests
+from asset_manifest import build_asset_manifests
+from build_profile import BuildProfiler, print_report, write_report
+from content_hash import HASH_MAP_NAME, HASHED_DIR_NAME, hash_items
+from fs_util import write_chunks_atomic, write_json_atomic, write_text_atomic, write_text_if_changed
+from link_check import validate_links
+from markdown_render import RENDER_DIR_NAME, render_markdown_items
+from media_probe import probe_media_items
+from precompress import COMPRESSED_DIR_NAME, SIDECAR_SUFFIXES, minified_path, precompress_outputs
+from search_index import SEARCH_DIR_NAME, build_search_index
+from thumbnails import THUMB_DIR_NAME, build_thumbnails
+
 
 ROOT = Path(__file__).resolve().parent.parent / "public" / "filesystem"
 OUTPUT_FILE = ROOT / "filesystem.json"
+SHARD_DIR_NAME = "filesystem.shards"
+# Generator output living inside public/filesystem; never listed as content.
+GENERATED_NAMES = {
+    *(name + suffix for name in ("filesystem.json", "filesystem.min.json") for suffix in ("", *SIDECAR_SUFFIXES)),
+    SHARD_DIR_NAME,
+    SEARCH_DIR_NAME,
+    RENDER_DIR_NAME,
+    THUMB_DIR_NAME,
+    HASHED_DIR_NAME,
+    HASH_MAP_NAME,
+    ARCHIVE_DIR_NAME,
+    COMPRESSED_DIR_NAME,
+}
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+CACHE_FILE = CACHE_DIR / "update_filesystem.json"
+CACHE_VERSION = 2
+COMPACT_VERSION = 1
+COMPACT_STAR = 1
+COMPACT_REFERENCE = 2
+# The "path" column holds the full path instead of the segment below the parent path.
+COMPACT_FULL_PATH = 4
+# Node keys stored in dedicated columns; anything else (added by output stages) goes to "props".
+COMPACT_KEYS = {"type", "name", "path", "size", "items", "url", "image", "desc", "star", "reference"}
 
 # Track reference errors to report at the end
 reference_errors: List[str] = []
 highlight_errors: List[str] = []
+# Broken document targets and .url links found by --validate
+validation_errors: List[str] = []
+
+
+class ScanEntry(NamedTuple):
+    """Directory entry with the stat data captured by os.scandir."""
+
+    name: str
+    path: Path
+    is_dir: bool
+    is_file: bool
+    size: int
+    mtime_ns: int
+
+
+def scan_folder(folder: Path) -> List[ScanEntry]:
+    """List folder with a single scandir call; only files cost an extra stat."""
+    entries: List[ScanEntry] = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                is_file = not is_dir and entry.is_file()
+                st = entry.stat() if is_file else None
+            except OSError:
+                continue
+            entries.append(
+                ScanEntry(
+                    entry.name,
+                    folder / entry.name,
+                    is_dir,
+                    is_file,
+                    st.st_size if st else 0,
+                    st.st_mtime_ns if st else 0,
+                )
+            )
+    return entries
+
+
+def is_listed_folder_name(name: str) -> bool:
+    """Whether a subfolder with this name is walked by build_items."""
+    return name != "images" and not name.startswith(".") and name not in GENERATED_NAMES
+
+
+def scan_tree(root: Path, jobs: int) -> Dict[Path, List[ScanEntry]]:
+    """
+    Scan root and every listed subfolder, fanning sibling folders out over a thread pool.
+
+    Each folder is listed by exactly one worker, so entries keep the directory order a serial
+    scan would see; build_items does its own sorting, which keeps the output identical.
+    """
+    listings: Dict[Path, List[ScanEntry]] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending: Dict[Future[List[ScanEntry]], Path] = {pool.submit(scan_folder, root): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder = pending.pop(future)
+                entries = future.result()
+                listings[folder] = entries
+                for entry in entries:
+                    if entry.is_dir and is_listed_folder_name(entry.name):
+                        pending[pool.submit(scan_folder, entry.path)] = entry.path
+    return listings
+
+
+class FilesystemIndex:
+    """
+    Path -> node index for a single build.
+
+    Every folder is built once and stored here in its pristine form (before the caller adds
+    "star" or "reference"), so references.txt entries become lookups instead of rebuilding
+    the referenced subtree. Folders still being built are tracked to detect reference cycles.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.folders: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.highlights: Dict[Path, Tuple[Set[str], List[str]]] = {}
+        self.building: Set[str] = set()
+        self.listings: Dict[Path, List[ScanEntry]] = {}
+        # Streamed builds (write_filesystem_streamed) defer subfolders as LazyFolder nodes.
+        # Folders named in some references.txt, and everything below them, are still built
+        # whole and indexed as above so references can reuse them.
+        self.lazy = False
+        self.referenced: Set[str] = set()
+        self.eager_depth = 0
+
+
+# Index of the build in progress; set by build_filesystem().
+fs_index: Optional[FilesystemIndex] = None
+# Directory listings read by the last build_filesystem(); --validate resolves targets against them.
+scan_listings: Dict[Path, List[ScanEntry]] = {}
+
+
+def content_root() -> Path:
+    return fs_index.root if fs_index is not None else ROOT
+
+
+def list_folder(folder: Path) -> List[ScanEntry]:
+    """Entries of folder, from the pre-scanned listings when available."""
+    if fs_index is None:
+        return scan_folder(folder)
+    entries = fs_index.listings.get(folder)
+    if entries is None:
+        entries = fs_index.listings[folder] = scan_folder(folder)
+    return entries
 
 
 def display_name(raw: str) -> str:
@@ -95,15 +247,36 @@ def read_references(folder: Path) -> List[str]:
 
 
 def read_highlights(folder: Path) -> Set[str]:
+    if fs_index is not None:
+        cached = fs_index.highlights.get(folder)
+        if cached is None:
+            cached = fs_index.highlights[folder] = _read_highlights_uncached(folder)
+    else:
+        cached = _read_highlights_uncached(folder)
+    highlighted, errors = cached
+    report_highlight_errors(errors)
+    return highlighted
+
+
+def report_highlight_errors(errors: List[str]) -> None:
+    """Report errors of a highlight.txt once per build, however many folders read the file."""
+    highlight_errors.extend(error for error in errors if error not in highlight_errors)
+    if build_cache is not None:
+        # Every folder reading the file keeps its errors, so a cached entry replays them.
+        build_cache.record_highlight_errors(errors)
+
+
+def _read_highlights_uncached(folder: Path) -> Tuple[Set[str], List[str]]:
     highlight_file = folder / "highlight.txt"
     if not highlight_file.is_file():
-        return set()
+        return set(), []
     try:
         content = highlight_file.read_text(encoding="utf-8").strip()
     except UnicodeDecodeError:
         content = highlight_file.read_text(encoding="utf-8", errors="replace").strip()
 
     highlighted: Set[str] = set()
+    errors: List[str] = []
     for line in content.splitlines():
         name = line.strip()
         if not name:
@@ -113,12 +286,10 @@ def read_highlights(folder: Path) -> Set[str]:
             continue
         target = folder / normalized
         if not target.exists():
-            highlight_errors.append(
-                f"Highlight error in {folder.relative_to(ROOT)}: '{name}' does not exist"
-            )
+            errors.append(f"Highlight error in {folder.relative_to(content_root())}: '{name}' does not exist")
             continue
         highlighted.add(normalized)
-    return highlighted
+    return highlighted, errors
 
 
 def read_ignore(folder: Path) -> Set[str]:
@@ -137,11 +308,283 @@ def read_ignore(folder: Path) -> Set[str]:
     return ignored
 
 
+def zip_has_jsdos(path: Path) -> bool:
+    """True if the zip contains a .jsdos folder, i.e. it can run in DOSBox."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return any(name.lower().startswith(".jsdos/") for name in zf.namelist())
+    except zipfile.BadZipFile:
+        return False
+
+
 def apply_star_if_needed(item: Dict[str, Any], entry_name: str, highlight_lower: Set[str]) -> None:
     if entry_name.lower() in highlight_lower:
         item["star"] = True
 
 
+class BuildFrame:
+    """What one folder build of an --incremental run depended on, for its cache entry."""
+
+    def __init__(self) -> None:
+        # {references.txt entry: BuildCache.reference_digest()}
+        self.deps: Dict[str, str] = {}
+        self.highlight_errors: List[str] = []
+        # A reference was rejected for pointing back into a folder being built, so the
+        # result depends on what else is being built and must not be cached.
+        self.cyclic = False
+
+
+class BuildCache:
+    """
+    Persistent cache of built folder subtrees for --incremental runs.
+
+    Each folder entry stores the subtree digest it was built from, the digests of every
+    reference it resolved (directly or through nested folders), the errors reported while
+    building it and the resulting node. Folders whose build rejected a cyclic reference are
+    not cached, since their result depends on the build order. An entry is reused only when all of those digests
+    still match, so dirty folders and their ancestors are rebuilt and everything else is
+    restored from the cache.
+
+    A stored node holds the folder's own items only: nested folders (subfolders and folder
+    references) are kept as {NESTED_KEY: path} stubs plus the keys the parent added, and are
+    restored from their own entries, so the cache stays proportional to the tree.
+    """
+
+    NESTED_KEY = "$folder"
+    # Keys a parent adds to a nested folder node (see apply_star_if_needed, build_reference_item).
+    PARENT_KEYS = ("star", "reference")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Content root of the last build; set by build_filesystem().
+        self.root = ROOT
+        self.generator = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used: Dict[str, Dict[str, Any]] = {}
+        self.digests: Dict[Path, str] = {}
+        self.frames: List[BuildFrame] = []
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION or data.get("generator") != self.generator:
+            return
+        self.entries = data.get("folders", {})
+
+    def save(self) -> None:
+        if not self.misses and self.entries.keys() >= self.used.keys():
+            # Nothing was rebuilt, so every entry used this run is already on disk.
+            return
+        # Entries nested inside reused subtrees were not looked up this run; keep them while
+        # their folder still exists so a later edit deep inside only rebuilds that branch.
+        folders = {key: entry for key, entry in self.entries.items() if (self.root / key).is_dir()}
+        folders.update(self.used)
+        data = {"version": CACHE_VERSION, "generator": self.generator, "folders": folders}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(self.path, json.dumps(data, ensure_ascii=False))
+
+    def start_run(self, changed: Optional[Iterable[Path]] = None) -> None:
+        """
+        Prepare for another build in the same process.
+
+        Stat digests are kept for everything outside changed paths and their ancestors, so a
+        watcher that knows what changed avoids re-statting the whole tree. None forgets all.
+        """
+        self.entries.update(self.used)
+        self.used = {}
+        self.frames.clear()
+        self.hits = 0
+        self.misses = 0
+        if changed is None:
+            self.digests.clear()
+            return
+        for path in changed:
+            for folder in (path, *path.parents):
+                self.digests.pop(folder, None)
+
+    def subtree_digest(self, folder: Path) -> str:
+        """Digest of names, sizes and mtimes of everything build_folder could read below folder."""
+        cached = self.digests.get(folder)
+        if cached is not None:
+            return cached
+        parts: List[str] = []
+        try:
+            entries = sorted(list_folder(folder), key=lambda e: e.name)
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.is_dir:
+                # images/ and hidden folders are never listed, only their presence matters.
+                if is_listed_folder_name(entry.name):
+                    parts.append(f"D\0{entry.name}\0{self.subtree_digest(entry.path)}")
+                else:
+                    parts.append(f"D\0{entry.name}")
+            else:
+                parts.append(f"F\0{entry.name}\0{entry.mtime_ns}\0{entry.size}")
+        digest = hashlib.sha1("\n".join(parts).encode("utf-8", errors="surrogateescape")).hexdigest()
+        self.digests[folder] = digest
+        return digest
+
+    def reference_digest(self, ref_path: str) -> str:
+        """Digest of everything build_reference_item reads for ref_path."""
+        target = content_root() / ref_path.rstrip("/")
+        highlight_file = target.parent / "highlight.txt"
+        try:
+            st = highlight_file.stat()
+            highlight_part = f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            highlight_part = "-"
+        if target.is_dir():
+            return f"D:{self.subtree_digest(target)}:{highlight_part}"
+        try:
+            st = target.stat()
+        except OSError:
+            return "missing"
+        return f"F:{st.st_mtime_ns}:{st.st_size}:{highlight_part}"
+
+    def record_reference(self, ref_path: str) -> None:
+        if not self.frames:
+            return
+        digest = self.reference_digest(ref_path)
+        for frame in self.frames:
+            frame.deps[ref_path] = digest
+
+    def record_highlight_errors(self, errors: List[str]) -> None:
+        for frame in self.frames:
+            frame.highlight_errors.extend(error for error in errors if error not in frame.highlight_errors)
+
+    def record_cycle(self) -> None:
+        for frame in self.frames:
+            frame.cyclic = True
+
+    def replay_dependencies(self, relative: Path) -> None:
+        """Propagate the references of a folder already built this run to enclosing folders."""
+        entry = self.used.get(relative.as_posix())
+        if entry is None:
+            # Built this run but not cached: it rejected a cyclic reference.
+            self.record_cycle()
+            return
+        for frame in self.frames:
+            frame.deps.update(entry["deps"])
+        self.record_highlight_errors(entry["highlight_errors"])
+
+    def lookup(self, folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
+        """Return a still-valid cache entry for folder, replaying its side effects."""
+        key = relative.as_posix()
+        entry = self.entries.get(key)
+        if entry is None or entry.get("digest") != self.subtree_digest(folder):
+            return None
+        deps: Dict[str, str] = entry.get("deps", {})
+        if any(self.reference_digest(ref) != digest for ref, digest in deps.items()):
+            return None
+        if not self.complete(entry):
+            return None
+        for frame in self.frames:
+            frame.deps.update(deps)
+        reference_errors.extend(entry["reference_errors"])
+        report_highlight_errors(entry["highlight_errors"])
+        self.used[key] = entry
+        self.hits += 1
+        return entry
+
+    def cached_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.used.get(key) or self.entries.get(key)
+
+    def complete(self, entry: Dict[str, Any]) -> bool:
+        """True if every folder nested in entry's node has an entry to restore it from."""
+        seen: Set[str] = set()
+        stack = [entry] if entry["node"] is not None else []
+        while stack:
+            for item in stack.pop()["node"]["items"]:
+                key = item.get(self.NESTED_KEY)
+                if key is None or key in seen:
+                    continue
+                seen.add(key)
+                child = self.cached_entry(key)
+                if child is None:
+                    return False
+                stack.append(child)
+        return True
+
+    def restore(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        A new node for entry, restoring nested folders from their entries.
+
+        Their dependencies and errors are part of the enclosing entry's, so they are not
+        replayed again; restored folders are shared through fs_index like built ones.
+        """
+        items: List[Dict[str, Any]] = []
+        for item in entry["node"]["items"]:
+            key = item.get(self.NESTED_KEY)
+            if key is None:
+                # Output stages annotate items in place; the entry must stay pristine.
+                items.append(dict(item))
+                continue
+            if fs_index is not None and fs_index.folders.get(key) is not None:
+                nested = fs_index.folders[key]
+            else:
+                child = self.cached_entry(key)
+                self.used[key] = child
+                nested = self.restore(child)
+                if fs_index is not None:
+                    fs_index.folders[key] = nested
+            nested = dict(nested)
+            nested.update((name, value) for name, value in item.items() if name != self.NESTED_KEY)
+            items.append(nested)
+        node = dict(entry["node"])
+        node["items"] = items
+        return node
+
+    def stub(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """node as stored: own items copied, nested folders replaced by stubs."""
+        items: List[Dict[str, Any]] = []
+        for item in node["items"]:
+            if item["type"] == "folder":
+                stub = {self.NESTED_KEY: item["path"]}
+                stub.update((name, value) for name, value in item.items() if name in self.PARENT_KEYS)
+                items.append(stub)
+            else:
+                items.append(dict(item))
+        return {**node, "items": items}
+
+    def build(self, folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
+        entry = self.lookup(folder, relative)
+        if entry is not None:
+            return self.restore(entry) if entry["node"] is not None else None
+
+        self.misses += 1
+        key = relative.as_posix()
+        frame = BuildFrame()
+        self.frames.append(frame)
+        ref_mark = len(reference_errors)
+        try:
+            node = _build_folder_uncached(folder, relative)
+        finally:
+            self.frames.pop()
+        for outer in self.frames:
+            outer.deps.update(frame.deps)
+        if frame.cyclic:
+            # Enclosing folders were marked too; drop a stale entry nothing may restore from.
+            self.entries.pop(key, None)
+            return node
+        self.used[key] = {
+            "digest": self.subtree_digest(folder),
+            "deps": frame.deps,
+            "reference_errors": reference_errors[ref_mark:],
+            "highlight_errors": frame.highlight_errors,
+            "node": self.stub(node) if node is not None else None,
+        }
+        return node
+
+
+# Active cache for --incremental builds; None means every folder is rebuilt from disk.
+build_cache: Optional[BuildCache] = None
+
+
 def build_reference_item(
     ref_path: str,
     containing_folder: Path,
@@ -152,21 +595,34 @@ def build_reference_item(
     is_folder_ref = ref_path.endswith("/")
     clean_path = ref_path.rstrip("/")
 
-    target = ROOT / clean_path
+    root = content_root()
+    target = root / clean_path
+
+    if build_cache is not None:
+        build_cache.record_reference(ref_path)
 
     if not target.exists():
         reference_errors.append(
-            f"Reference error in {containing_folder.relative_to(ROOT)}: "
+            f"Reference error in {containing_folder.relative_to(root)}: "
             f"'{ref_path}' does not exist"
         )
         return None
 
+    rel_path = Path(clean_path)
+    if fs_index is not None and rel_path.as_posix() in fs_index.building:
+        if build_cache is not None:
+            build_cache.record_cycle()
+        reference_errors.append(
+            f"Reference error in {containing_folder.relative_to(root)}: "
+            f"'{ref_path}' refers back to a folder that contains this reference"
+        )
+        return None
+
     base_name = Path(clean_path).name
     parent_highlights = {name.lower() for name in read_highlights(target.parent)} if target.parent else set()
     highlight_sources = highlight_lower | parent_highlights
     if target.is_dir():
-        # Build a folder reference - recursively get its contents
-        rel_path = Path(clean_path)
+        # Build a folder reference - reuses the indexed folder when it was already built
         nested = build_folder(target, rel_path)
         if nested:
             nested["reference"] = "Yes"
@@ -175,7 +631,7 @@ def build_reference_item(
         return None
     else:
         # Build a file reference
-        result = build_file_item(target, Path(clean_path), is_reference=True)
+        result = build_file_item(target, rel_path, is_reference=True)
         if result:
             apply_star_if_needed(result, base_name, highlight_sources)
         return result
@@ -239,16 +695,16 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             children.append(ref_item)
 
     # Split into folders/files, then sort each group alphabetically by display name.
-    entries = list(folder.iterdir())
-    folders = sorted([p for p in entries if p.is_dir()], key=lambda p: display_name(p.name).lower())
-    files = sorted([p for p in entries if p.is_file()], key=lambda p: display_name(p.name).lower())
+    entries = list_folder(folder)
+    folders = sorted([e for e in entries if e.is_dir], key=lambda e: display_name(e.name).lower())
+    files = sorted([e for e in entries if e.is_file], key=lambda e: display_name(e.name).lower())
     ordered = folders + files
     archive_exts = {".zip", ".rar", ".7z"}
     html_exts = {".html", ".htm"}
     sound_exts = {".mp3", ".ogg", ".wav", ".flac", ".m4a", ".wmv"}
     image_exts = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
     for entry in ordered:
-        if entry.name == "filesystem.json":
+        if entry.name in GENERATED_NAMES:
             continue
         if entry.name.startswith("."):
             continue
@@ -262,18 +718,19 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
         if entry.name.lower() in ignore_lower:
             continue
         # Skip folder_image files - they are folder metadata
-        if entry.is_file() and entry.stem == "folder_image":
+        if entry.is_file and entry.path.stem == "folder_image":
             continue
         rel_path = relative / entry.name
-        if entry.is_dir():
+        suffix = entry.path.suffix.lower()
+        size = entry.size
+        if entry.is_dir:
             if entry.name == "images":
                 continue
-            nested = build_folder(entry, rel_path)
+            nested = build_folder(entry.path, rel_path, deferrable=True)
             if nested:
                 apply_star_if_needed(nested, entry.name, highlight_lower)
                 children.append(nested)
-        elif entry.suffix.lower() == ".md" and entry.name != "folder.md":
-            size = entry.stat().st_size
+        elif suffix == ".md" and entry.name != "folder.md":
             item = {
                 "type": "wordpad",
                 "name": display_name(entry.name),
@@ -282,8 +739,7 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(item, entry.name, highlight_lower)
             children.append(item)
-        elif entry.suffix.lower() in {".txt", ".js"}:
-            size = entry.stat().st_size
+        elif suffix in {".txt", ".js"}:
             item = {
                 "type": "notepad",
                 "name": display_name(entry.name),
@@ -292,8 +748,7 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(item, entry.name, highlight_lower)
             children.append(item)
-        elif entry.suffix.lower() in archive_exts:
-            size = entry.stat().st_size
+        elif suffix in archive_exts:
             archive_item = {
                 "type": "archive",
                 "name": display_name(entry.name),
@@ -302,28 +757,20 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(archive_item, entry.name, highlight_lower)
             # If a zip contains a .jsdos folder, also expose it as an executable item.
-            if entry.suffix.lower() == ".zip":
-                has_jsdos = False
-                try:
-                    with zipfile.ZipFile(entry) as zf:
-                        has_jsdos = any(name.lower().startswith(".jsdos/") for name in zf.namelist())
-                except zipfile.BadZipFile:
-                    has_jsdos = False
-                if has_jsdos:
-                    exec_item = {
-                        "type": "executable",
-                        "name": display_name(entry.name),
-                        "path": rel_path.as_posix(),
-                        "size": size,
-                    }
-                    apply_star_if_needed(exec_item, entry.name, highlight_lower)
-                    # Executable should appear before the plain archive entry.
-                    children.append(exec_item)
-                    children.append(archive_item)
-                    continue
+            if suffix == ".zip" and zip_has_jsdos(entry.path):
+                exec_item = {
+                    "type": "executable",
+                    "name": display_name(entry.name),
+                    "path": rel_path.as_posix(),
+                    "size": size,
+                }
+                apply_star_if_needed(exec_item, entry.name, highlight_lower)
+                # Executable should appear before the plain archive entry.
+                children.append(exec_item)
+                children.append(archive_item)
+                continue
             children.append(archive_item)
-        elif entry.suffix.lower() in html_exts:
-            size = entry.stat().st_size
+        elif suffix in html_exts:
             item = {
                 "type": "html",
                 "name": display_name(entry.name),
@@ -332,11 +779,10 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(item, entry.name, highlight_lower)
             children.append(item)
-        elif entry.suffix.lower() == ".url":
-            link = read_url_target(entry)
+        elif suffix == ".url":
+            link = read_url_target(entry.path)
             if not link:
                 continue
-            size = entry.stat().st_size
             item = {
                 "type": classify_external_url(link),
                 "name": display_name(entry.name),
@@ -346,8 +792,7 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(item, entry.name, highlight_lower)
             children.append(item)
-        elif entry.suffix.lower() in sound_exts:
-            size = entry.stat().st_size
+        elif suffix in sound_exts:
             item = {
                 "type": "sound",
                 "name": display_name(entry.name),
@@ -356,8 +801,7 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
             }
             apply_star_if_needed(item, entry.name, highlight_lower)
             children.append(item)
-        elif entry.suffix.lower() in image_exts:
-            size = entry.stat().st_size
+        elif suffix in image_exts:
             item = {
                 "type": "image",
                 "name": display_name(entry.name),
@@ -371,7 +815,39 @@ def build_items(folder: Path, relative: Path) -> List[Dict[str, Any]]:
     return children
 
 
-def build_folder(folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
+def build_folder(folder: Path, relative: Path, deferrable: bool = False) -> Optional[Dict[str, Any]]:
+    """Folder node, or None if it has no items; deferrable folders may be returned as LazyFolder."""
+    if fs_index is None:
+        return _build_folder_cached(folder, relative)
+    if deferrable and fs_index.lazy and not fs_index.eager_depth:
+        # Built when the writer reaches it, which keeps the build order of build_filesystem().
+        return LazyFolder(folder, relative)
+
+    key = relative.as_posix()
+    if key in fs_index.folders:
+        if build_cache is not None:
+            build_cache.replay_dependencies(relative)
+        node = fs_index.folders[key]
+    else:
+        fs_index.building.add(key)
+        fs_index.eager_depth += 1
+        try:
+            node = _build_folder_cached(folder, relative)
+        finally:
+            fs_index.eager_depth -= 1
+            fs_index.building.discard(key)
+        fs_index.folders[key] = node
+    # Callers add "star"/"reference" to the returned node; the subtree itself is shared.
+    return dict(node) if node is not None else None
+
+
+def _build_folder_cached(folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
+    if build_cache is not None:
+        return build_cache.build(folder, relative)
+    return _build_folder_uncached(folder, relative)
+
+
+def _build_folder_uncached(folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
     items = build_items(folder, relative)
     if not items:
         return None
@@ -394,26 +870,305 @@ def build_folder(folder: Path, relative: Path) -> Optional[Dict[str, Any]]:
     return node
 
 
-def build_filesystem(root: Path) -> Dict[str, Any]:
-    items = build_items(root, Path())
+def build_filesystem(root: Path, jobs: int = 1) -> Dict[str, Any]:
+    """Build the filesystem tree; jobs > 1 pre-scans the folders in parallel."""
+    global fs_index, scan_listings
+    reference_errors.clear()
+    highlight_errors.clear()
+    fs_index = FilesystemIndex(root)
+    if build_cache is not None:
+        build_cache.root = root
+    if jobs > 1:
+        fs_index.listings = scan_tree(root, jobs)
+    try:
+        items = build_items(root, Path())
+    finally:
+        scan_listings = fs_index.listings
+        fs_index = None
     return {"items": items}
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Regenerate filesystem.json from public/filesystem contents.")
-    parser.add_argument(
-        "--output",
-        default=str(OUTPUT_FILE),
-        help="Path to write filesystem.json (default: public/filesystem/filesystem.json)",
+class LazyFolder(dict):
+    """
+    Folder node of a streamed build whose subtree is built only when iter_tree_json reaches it.
+
+    The dict holds "type", "name" and "path" plus whatever callers add ("star"), so sorting and
+    apply_star_if_needed work as on built nodes; "items", "image" and "desc" are produced while
+    writing. A folder without items is dropped at that point, as build_folder would drop it.
+    Referenced folders are built whole by build_shared() instead, since references reuse them.
+    """
+
+    def __init__(self, folder: Path, relative: Path) -> None:
+        super().__init__(type="folder", name=display_name(folder.name), path=relative.as_posix())
+        self.folder = folder
+        self.relative = relative
+        self.shared = self["path"] in fs_index.referenced
+
+    def build_shared(self) -> Optional[Dict[str, Any]]:
+        node = build_folder(self.folder, self.relative)
+        if node is not None:
+            node.update((key, value) for key, value in self.items() if key not in ("type", "name", "path"))
+        return node
+
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        key = self["path"]
+        fs_index.building.add(key)
+        try:
+            items = build_items(self.folder, self.relative)
+            fs_index.listings.pop(self.folder, None)
+            yield from items
+        finally:
+            fs_index.building.discard(key)
+
+
+ResolvedNode = Tuple[Dict[str, Any], Optional[Iterator[Any]]]
+
+
+def resolve_lazy(items: Iterable[Dict[str, Any]]) -> Iterator[ResolvedNode]:
+    """
+    Pair each node with an iterator over its resolved items if it is a LazyFolder.
+
+    A lazy folder is expanded up to its first non-empty item to learn whether it exists; the
+    rest of its subtree is built as the returned iterator is consumed, in the same depth-first
+    order build_filesystem() builds it.
+    """
+    for item in items:
+        if isinstance(item, LazyFolder) and item.shared:
+            node = item.build_shared()
+            if node is not None:
+                yield node, None
+        elif isinstance(item, LazyFolder):
+            children = resolve_lazy(item.iter_items())
+            first = next(children, None)
+            if first is None:
+                continue
+            yield item, itertools.chain([first], children)
+        else:
+            yield item, None
+
+
+def iter_tree_json(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Chunks of json.dumps({"items": items}, indent=2, ensure_ascii=False), expanding lazy folders."""
+    encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+
+    def value(obj: Any, level: int) -> str:
+        # Structural newlines are the only raw newlines in the output (strings escape theirs).
+        return encoder.encode(obj).replace("\n", "\n" + "  " * level)
+
+    def node_list(resolved: Iterator[ResolvedNode], level: int) -> Iterator[str]:
+        # Built nodes are batched into one chunk per run; nested generators cost per chunk.
+        inner = "\n" + "  " * (level + 1)
+        parts: List[str] = []
+        first = True
+        for node, children in resolved:
+            parts.append(("[" if first else ",") + inner)
+            first = False
+            if children is None:
+                parts.append(value(node, level + 1))
+            else:
+                yield "".join(parts)
+                parts = []
+                yield from lazy_folder(node, children, level + 1)
+        yield "".join(parts) + ("[]" if first else "\n" + "  " * level + "]")
+
+    def lazy_folder(node: LazyFolder, children: Iterator[ResolvedNode], level: int) -> Iterator[str]:
+        inner = "\n" + "  " * (level + 1)
+        head = ",".join(f"{inner}{encoder.encode(key)}: {encoder.encode(node[key])}" for key in ("type", "name", "path"))
+        yield "{" + head + f",{inner}\"items\": "
+        yield from node_list(children, level + 1)
+        tail: Dict[str, Any] = {}
+        image = find_folder_image(node.folder)
+        if image:
+            tail["image"] = image
+        desc = read_desc(node.folder)
+        if desc:
+            tail["desc"] = desc
+        tail.update((key, val) for key, val in node.items() if key not in ("type", "name", "path"))
+        yield "".join(f",{inner}{encoder.encode(key)}: {value(val, level + 1)}" for key, val in tail.items())
+        yield "\n" + "  " * level + "}"
+
+    yield '{\n  "items": '
+    yield from node_list(resolve_lazy(items), 1)
+    yield "\n}"
+
+
+def collect_reference_targets(root: Path) -> Set[str]:
+    """
+    build_folder keys of every path named in a references.txt that a build can read.
+
+    Walks the listed tree plus every referenced folder, since a reference may point at a
+    folder that is not listed itself (e.g. an images/ folder) and has references of its own.
+    """
+    targets: Set[str] = set()
+    walked: Set[Path] = set()
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        if folder in walked:
+            continue
+        walked.add(folder)
+        for entry in list_folder(folder):
+            if entry.is_dir and is_listed_folder_name(entry.name):
+                stack.append(entry.path)
+            elif entry.is_file and entry.name == "references.txt":
+                for ref_path in read_references(folder):
+                    key = Path(ref_path.rstrip("/")).as_posix()
+                    targets.add(key)
+                    if (root / key).is_dir():
+                        stack.append(root / key)
+    return targets
+
+
+def write_filesystem_streamed(root: Path, output_path: Path, jobs: int = 1) -> None:
+    """
+    Build the tree and write it as nested JSON in one pass; the bytes match build_filesystem()
+    followed by json.dumps(indent=2, ensure_ascii=False).
+
+    Folders are built in the same order as build_filesystem() builds them, but only referenced
+    subtrees are kept in memory; everything else is written and dropped as soon as it is built.
+    The only up-front pass reads the references.txt files to learn which folders are shared.
+    """
+    global fs_index
+    reference_errors.clear()
+    highlight_errors.clear()
+    fs_index = FilesystemIndex(root)
+    fs_index.lazy = True
+    if jobs > 1:
+        fs_index.listings = scan_tree(root, jobs)
+    try:
+        fs_index.referenced = collect_reference_targets(root)
+        write_chunks_atomic(output_path, iter_tree_json(build_items(root, Path())))
+    finally:
+        fs_index = None
+
+
+class PollingWatcher:
+    """Detect changes under root by comparing periodic stat snapshots."""
+
+    def __init__(self, root: Path, interval: float = 1.0) -> None:
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot: Dict[Path, Tuple[int, int]] = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            folder = Path(dirpath)
+            snapshot[folder] = (0, 0)
+            for name in filenames:
+                path = folder / name
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Return paths changed since the previous call, or an empty set after timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+            current = self._take_snapshot()
+            changed = {path for path in current.keys() | self.snapshot.keys() if current.get(path) != self.snapshot.get(path)}
+            self.snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Detect changes under root with Linux inotify, watching every folder recursively."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
     )
-    args = parser.parse_args()
+    EVENT_HEADER = struct.Struct("iIII")
 
-    data = build_filesystem(ROOT)
-    output_path = Path(args.output)
-    output_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-    print(f"Wrote filesystem structure to {output_path}")
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, Path] = {}
+        self._add_tree(root)
 
-    # Report any reference errors
+    def _add_tree(self, folder: Path) -> None:
+        for dirpath, dirnames, _ in os.walk(folder):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self.watches[wd] = Path(dirpath)
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Return paths changed since the previous call, or an empty set after timeout."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed: Set[Path] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost; report the root so the caller rescans everything.
+                    changed.add(self.root)
+                    continue
+                folder = self.watches.get(wd)
+                if folder is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    del self.watches[wd]
+                    continue
+                path = folder / os.fsdecode(name) if name else folder
+                changed.add(path)
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO) and not path.name.startswith("."):
+                    self._add_tree(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(root: Path, poll: bool = False) -> Any:
+    """Return an inotify watcher on Linux, falling back to stat polling elsewhere."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as exc:
+            print(f"inotify unavailable ({exc}); falling back to polling", file=sys.stderr)
+    return PollingWatcher(root)
+
+
+def report_errors() -> bool:
+    """Print reference/highlight errors of the last build; return True if there were none."""
     if reference_errors:
         print("\nReference errors found:", file=sys.stderr)
         for error in reference_errors:
@@ -422,7 +1177,549 @@ def main() -> None:
         print("\nHighlight errors found:", file=sys.stderr)
         for error in highlight_errors:
             print(f"  - {error}", file=sys.stderr)
-    if reference_errors or highlight_errors:
+    if validation_errors:
+        print("\nValidation errors found:", file=sys.stderr)
+        for error in validation_errors:
+            print(f"  - {error}", file=sys.stderr)
+    return not (reference_errors or highlight_errors or validation_errors)
+
+
+def shard_id(path: str) -> str:
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_filesystem(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Split the nested tree into a root manifest and one shard per folder path.
+
+    Folder nodes keep their own properties but replace "items" with "count" and a "shard"
+    pointer (relative to the manifest). References to a folder point at the same shard as the
+    folder itself instead of carrying a copy of its subtree.
+    """
+    shards: Dict[str, Dict[str, Any]] = {}
+
+    def stub(node: Dict[str, Any]) -> Dict[str, Any]:
+        if node.get("type") != "folder":
+            return node
+        name = f"{shard_id(node['path'])}.json"
+        result = {key: value for key, value in node.items() if key != "items"}
+        result["count"] = len(node["items"])
+        result["shard"] = f"{SHARD_DIR_NAME}/{name}"
+        if name not in shards:
+            shards[name] = {"path": node["path"], "items": [stub(child) for child in node["items"]]}
+        return result
+
+    manifest = {"items": [stub(item) for item in data["items"]]}
+    return manifest, shards
+
+
+def write_shards(shard_dir: Path, shards: Dict[str, Dict[str, Any]]) -> int:
+    """Write changed shards and return the number written; stale shards are removed by the caller."""
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for name, shard in shards.items():
+        text = json.dumps(shard, ensure_ascii=False, separators=(",", ":"))
+        if write_text_if_changed(shard_dir / name, text):
+            written += 1
+    return written
+
+
+def remove_stale_shards(shard_dir: Path, shards: Dict[str, Dict[str, Any]]) -> None:
+    for path in shard_dir.glob("*.json"):
+        if path.name not in shards:
+            path.unlink()
+
+
+def compact_filesystem(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert the nested tree into parallel columns with interned strings.
+
+    Nodes are stored breadth-first, so the children of every folder are contiguous and
+    "parent" never decreases. Folders sharing a path (a folder and references to it) store
+    their children once; later ones carry a "link" to the node that owns the children.
+    "paths" maps every path to the first node that has it, for O(1) lookups. Properties added
+    by output stages are kept in "props" as {key: [[node, value], ...]}.
+    """
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        idx = string_ids.get(value)
+        if idx is None:
+            idx = string_ids[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    columns: Dict[str, List[int]] = {key: [] for key in ("type", "name", "parent", "path", "size", "flags")}
+    extras: Dict[str, List[List[int]]] = {"url": [], "image": [], "desc": [], "link": []}
+    props: Dict[str, List[List[Any]]] = {}
+    paths: Dict[str, int] = {}
+    owners: Dict[str, int] = {}
+
+    queue = deque((item, -1, "") for item in data["items"])
+    while queue:
+        node, parent, parent_path = queue.popleft()
+        idx = len(columns["type"])
+        path = node["path"]
+        prefix = f"{parent_path}/" if parent_path else ""
+        flags = 0
+        if path.startswith(prefix) and path[len(prefix):] and "/" not in path[len(prefix):]:
+            path_value = path[len(prefix):]
+        else:
+            path_value = path
+            flags |= COMPACT_FULL_PATH
+        if node.get("star"):
+            flags |= COMPACT_STAR
+        if node.get("reference") == "Yes":
+            flags |= COMPACT_REFERENCE
+
+        columns["type"].append(intern(node["type"]))
+        columns["name"].append(intern(node["name"]))
+        columns["parent"].append(parent)
+        columns["path"].append(intern(path_value))
+        columns["size"].append(node.get("size", -1))
+        columns["flags"].append(flags)
+        for key in ("url", "image", "desc"):
+            if key in node:
+                extras[key].append([idx, intern(node[key])])
+        for key, value in node.items():
+            if key not in COMPACT_KEYS:
+                props.setdefault(key, []).append([idx, value])
+        paths.setdefault(path, idx)
+
+        if node["type"] == "folder":
+            if path in owners:
+                extras["link"].append([idx, owners[path]])
+            else:
+                owners[path] = idx
+                queue.extend((child, idx, path) for child in node["items"])
+
+    return {
+        "format": "compact",
+        "version": COMPACT_VERSION,
+        "strings": strings,
+        **columns,
+        **extras,
+        "props": props,
+        "paths": paths,
+    }
+
+
+def expand_compact(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the nested tree from compact_filesystem() output, key order included."""
+    strings: List[str] = compact["strings"]
+    extras = {key: {idx: value for idx, value in compact[key]} for key in ("url", "image", "desc", "link")}
+    props = {key: {idx: value for idx, value in values} for key, values in compact.get("props", {}).items()}
+    count = len(compact["type"])
+    nodes: List[Dict[str, Any]] = []
+    children: List[List[Dict[str, Any]]] = [[] for _ in range(count)]
+    root_items: List[Dict[str, Any]] = []
+
+    for idx in range(count):
+        parent = compact["parent"][idx]
+        flags = compact["flags"][idx]
+        node_type = strings[compact["type"][idx]]
+        path = strings[compact["path"][idx]]
+        if not flags & COMPACT_FULL_PATH and parent >= 0:
+            path = f"{nodes[parent]['path']}/{path}"
+        is_reference = bool(flags & COMPACT_REFERENCE)
+
+        node: Dict[str, Any]
+        if node_type == "folder":
+            owner = extras["link"].get(idx, idx)
+            node = {"type": node_type, "name": strings[compact["name"][idx]], "path": path, "items": children[owner]}
+            for key in ("image", "desc"):
+                if idx in extras[key]:
+                    node[key] = strings[extras[key][idx]]
+        elif is_reference:
+            # Referenced files are built by build_file_item, which orders keys differently.
+            node = {"name": strings[compact["name"][idx]], "path": path, "size": compact["size"][idx]}
+            node["reference"] = "Yes"
+            node["type"] = node_type
+        else:
+            node = {"type": node_type, "name": strings[compact["name"][idx]], "path": path, "size": compact["size"][idx]}
+        if node_type != "folder" and idx in extras["url"]:
+            node["url"] = strings[extras["url"][idx]]
+        if node_type == "folder" and is_reference:
+            node["reference"] = "Yes"
+        if flags & COMPACT_STAR:
+            node["star"] = True
+        for key, values in props.items():
+            if idx in values:
+                node[key] = values[idx]
+
+        nodes.append(node)
+        (children[parent] if parent >= 0 else root_items).append(node)
+
+    return {"items": root_items}
+
+
+# Functions timed by --profile, grouped into the phases of the report.
+PROFILE_PHASES = {
+    "scan": ["scan_folder"],
+    "references": ["read_references", "build_reference_item"],
+    "metadata files": ["_read_highlights_uncached", "read_ignore", "read_desc", "find_folder_image"],
+    "url files": ["read_url_target", "classify_external_url"],
+    "file items": ["build_file_item"],
+    "media probe": ["probe_media_items"],
+    "content hash": ["hash_items"],
+    "archive listings": ["build_archive_manifests"],
+    "thumbnails": ["build_thumbnails"],
+    "markdown render": ["render_markdown_items"],
+    "asset lists": ["build_asset_manifests"],
+    "search index": ["build_search_index"],
+    "validation": ["validate_links"],
+    "precompress": ["precompress_outputs"],
+    # Output is encoded while it is written: iter_tree_json is timed per chunk it produces for
+    # the streamed default path, and write_json_atomic's time is almost all encoding.
+    "json": ["json.dumps", "iter_tree_json", "write_json_atomic"],
+    "write": ["write_text_atomic", "write_chunks_atomic", "write_shards"],
+}
+
+
+def install_profile_hooks(profiler: BuildProfiler) -> None:
+    """Instrument this module for --profile; folders and archives are also timed individually."""
+    module = sys.modules[__name__]
+    profiler.hook_all(module, PROFILE_PHASES)
+    profiler.hook(module, "build_items", "build items", key=lambda folder, relative: relative.as_posix())
+    profiler.hook(module, "zip_has_jsdos", "zip check", key=lambda path: path.relative_to(content_root()).as_posix())
+
+
+def regenerate(args: argparse.Namespace) -> bool:
+    """Build the tree, run the requested output stages, write the output atomically and report errors."""
+    output_path = Path(args.output)
+    validation_errors.clear()
+    stages = (
+        args.probe_media, args.content_hash, args.hashed_assets, args.archive_manifests,
+        args.thumbnails, args.render_markdown, args.asset_manifest, args.search_index, args.precompress,
+        args.validate,
+    )
+    if args.format == "nested" and build_cache is None and not any(stages):
+        # Nothing needs the finished tree, so it is written while it is built.
+        write_filesystem_streamed(ROOT, output_path, jobs=max(1, args.jobs))
+        print(f"Wrote filesystem structure to {output_path}")
+        return report_errors()
+
+    data = build_filesystem(ROOT, jobs=max(1, args.jobs))
+
+    if args.validate:
+        listings = {
+            "" if folder == ROOT else folder.relative_to(ROOT).as_posix(): [entry.name for entry in entries]
+            for folder, entries in scan_listings.items()
+        }
+        errors, checked = validate_links(
+            data, ROOT, CACHE_DIR / "asset_manifest.json", CACHE_DIR / "link_check.json",
+            external=not args.validate_offline, ttl_hours=args.link_ttl, concurrency=args.link_concurrency,
+            listings=listings,
+        )
+        validation_errors.extend(errors)
+        print(f"Validated document targets and links ({checked} URL(s) checked, {len(errors)} problem(s))")
+
+    if args.probe_media:
+        annotated, probed = probe_media_items(data, ROOT, CACHE_DIR / "media_probe.json")
+        print(f"Probed media metadata for {annotated} item(s) ({probed} file(s) read)")
+
+    if args.content_hash or args.hashed_assets:
+        items, read = hash_items(
+            data, ROOT, output_path.parent, CACHE_DIR / "content_hash.json",
+            jobs=max(1, args.workers), emit=args.hashed_assets,
+        )
+        print(f"Hashed {items} item(s) ({read} file(s) read)")
+
+    if args.archive_manifests:
+        archive_dir = output_path.parent / ARCHIVE_DIR_NAME
+        listed, read = build_archive_manifests(data, ROOT, archive_dir, CACHE_DIR / "archive_manifest.json")
+        print(f"Listed {listed} archive(s) in {archive_dir} ({read} read)")
+
+    if args.thumbnails:
+        thumb_dir = output_path.parent / THUMB_DIR_NAME
+        result = build_thumbnails(
+            data, ROOT, thumb_dir, CACHE_DIR / "thumbnails.json",
+            size=args.thumbnail_size, webp=args.thumbnail_webp, jobs=max(1, args.workers),
+        )
+        if result is None:
+            print("Pillow is not installed; skipping thumbnails (pip install Pillow)")
+        else:
+            print(f"Listed {result[0]} image variant(s) in {thumb_dir} ({result[1]} written)")
+
+    if args.render_markdown:
+        render_dir = output_path.parent / RENDER_DIR_NAME
+        docs, written = render_markdown_items(data, ROOT, render_dir, CACHE_DIR / "markdown_render.json")
+        print(f"Rendered {docs} document(s) into {render_dir} ({written} changed)")
+
+    if args.asset_manifest:
+        documents, parsed = build_asset_manifests(data, ROOT, CACHE_DIR / "asset_manifest.json")
+        print(f"Listed assets of {documents} document(s) ({parsed} parsed)")
+
+    if args.search_index:
+        search_dir = output_path.parent / SEARCH_DIR_NAME
+        docs, written = build_search_index(data, ROOT, search_dir, CACHE_DIR / "search_index.json")
+        print(f"Indexed {docs} document(s) into {search_dir} ({written} shard(s) changed)")
+
+    written_output = data
+    if args.format == "sharded":
+        manifest, shards = shard_filesystem(data)
+        written_output = manifest
+        shard_dir = output_path.parent / SHARD_DIR_NAME
+        # Shards go first so the manifest never points at a shard that is not there yet.
+        written = write_shards(shard_dir, shards)
+        write_json_atomic(output_path, manifest, indent=2, ensure_ascii=False)
+        remove_stale_shards(shard_dir, shards)
+        print(f"Wrote {len(shards)} folder shard(s) to {shard_dir} ({written} changed)")
+    elif args.format == "compact":
+        written_output = None
+        text = json.dumps(compact_filesystem(data), ensure_ascii=False, separators=(",", ":"))
+        write_text_atomic(output_path, text)
+    else:
+        write_json_atomic(output_path, data, indent=2, ensure_ascii=False)
+    print(f"Wrote filesystem structure to {output_path}")
+
+    if args.precompress:
+        outputs = [output_path]
+        if written_output is not None:
+            # The compact format is minified already.
+            min_path = minified_path(output_path)
+            text = json.dumps(written_output, ensure_ascii=False, separators=(",", ":"))
+            write_text_if_changed(min_path, text)
+            outputs.append(min_path)
+        compressed_dir = output_path.parent / COMPRESSED_DIR_NAME
+        sources, compressed = precompress_outputs(
+            data, ROOT, outputs, compressed_dir, CACHE_DIR / "precompress.json", jobs=max(1, args.workers),
+        )
+        print(f"Precompressed {sources} file(s), item sidecars in {compressed_dir} ({compressed} compressed)")
+
+    if build_cache is not None:
+        build_cache.save()
+        print(f"Incremental build: {build_cache.hits} folder(s) reused, {build_cache.misses} rebuilt")
+    return report_errors()
+
+
+def is_generated_path(path: Path, output_path: Path) -> bool:
+    """Whether a changed path is our own output (or its temp file) rather than content."""
+    if path == output_path or path.name.startswith("."):
+        return True
+    try:
+        relative = path.relative_to(ROOT)
+    except ValueError:
+        return False
+    if relative.parts and relative.parts[0] in GENERATED_NAMES:
+        return True
+    return any(part.startswith(".") for part in relative.parts)
+
+
+def watch(args: argparse.Namespace) -> None:
+    """Regenerate the output whenever content under ROOT changes."""
+    output_path = Path(args.output).resolve()
+    watcher = create_watcher(ROOT, poll=args.poll)
+    print(f"Watching {ROOT} for changes (Ctrl+C to stop)")
+    failed = False
+    try:
+        while True:
+            changed = watcher.wait(None)
+            # Debounce: keep collecting until the tree has been quiet for a moment.
+            while True:
+                more = watcher.wait(args.debounce)
+                if not more:
+                    break
+                changed |= more
+            changed = {path for path in changed if not is_generated_path(path, output_path)}
+            if not changed:
+                continue
+            assert build_cache is not None
+            # After a failed rebuild the stat digests may be stale, so re-stat everything.
+            build_cache.start_run(None if failed or ROOT in changed else changed)
+            started = time.perf_counter()
+            try:
+                regenerate(args)
+            except (OSError, ValueError) as exc:
+                # Files can vanish or be half-written while an editor or copy is still busy;
+                # the next change event retries.
+                failed = True
+                print(f"Rebuild failed after {len(changed)} change(s): {exc}", file=sys.stderr)
+                continue
+            failed = False
+            print(f"Rebuilt in {time.perf_counter() - started:.2f}s after {len(changed)} change(s)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate filesystem.json from public/filesystem contents.")
+    parser.add_argument(
+        "--output",
+        default=str(OUTPUT_FILE),
+        help="Path to write filesystem.json (default: public/filesystem/filesystem.json)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse folders that have not changed since the previous run (see --cache)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=str(CACHE_FILE),
+        help="Path of the --incremental build cache (default: .cache/update_filesystem.json)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to scan folders (default: 1, scan while building)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used for hashing, thumbnails and precompression (default: CPU count)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("nested", "sharded", "compact"),
+        default="nested",
+        help="nested: the whole tree in one file; sharded: a root manifest plus one file per folder "
+        f"in {SHARD_DIR_NAME}/ next to the output; compact: columnar arrays with a path index "
+        "(default: nested)",
+    )
+    parser.add_argument(
+        "--probe-media",
+        action="store_true",
+        help="Add width/height to image items and duration/bitrate to sound items, read from file headers",
+    )
+    parser.add_argument(
+        "--content-hash",
+        action="store_true",
+        help="Add the content hash of every file item (cached by modification time and size)",
+    )
+    parser.add_argument(
+        "--hashed-assets",
+        choices=["map", "copies"],
+        help=f"Implies --content-hash. map: write {HASH_MAP_NAME} next to the output; copies: also hardlink "
+        f"every file to its hashed name in {HASHED_DIR_NAME}/",
+    )
+    parser.add_argument(
+        "--archive-manifests",
+        action="store_true",
+        help=f"Write the entry list of every .zip/.rar/.7z item (and the dosbox.conf summary of executables) "
+        f"to {ARCHIVE_DIR_NAME}/ next to the output",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        action="store_true",
+        help=f"Create downscaled variants of folder images, image items and article images in {THUMB_DIR_NAME}/ "
+        "next to the output (requires Pillow)",
+    )
+    parser.add_argument(
+        "--thumbnail-size",
+        type=int,
+        default=320,
+        help="Bounding box in pixels of --thumbnails variants (default: 320)",
+    )
+    parser.add_argument(
+        "--thumbnail-webp",
+        action="store_true",
+        help="Also create a WebP variant of every image with --thumbnails",
+    )
+    parser.add_argument(
+        "--render-markdown",
+        action="store_true",
+        help=f"Pre-render every wordpad document to HTML in {RENDER_DIR_NAME}/ next to the output",
+    )
+    parser.add_argument(
+        "--asset-manifest",
+        action="store_true",
+        help="List the local images, scripts, stylesheets and links of every .md/.html item in document "
+        "order, with sizes and total weight, for preloading",
+    )
+    parser.add_argument(
+        "--search-index",
+        action="store_true",
+        help=f"Also build the full-text search index of .md/.txt documents into {SEARCH_DIR_NAME}/ next to the output",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regenerate the output whenever public/filesystem changes (implies --incremental)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.3,
+        help="Seconds of quiet to wait for after a change before rebuilding in --watch mode (default: 0.3)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Use stat polling instead of inotify in --watch mode",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write a minified copy of the output plus .gz sidecars (and .br if the brotli module is "
+        f"installed) for it and for every .md/.txt/.html item, the latter in {COMPRESSED_DIR_NAME}/",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Report missing local images/links of .md/.html items and unreachable .url targets",
+    )
+    parser.add_argument(
+        "--validate-offline",
+        action="store_true",
+        help="With --validate, check local targets only",
+    )
+    parser.add_argument(
+        "--link-ttl",
+        type=float,
+        default=168.0,
+        help="Hours a reachable .url target is not checked again (default: 168)",
+    )
+    parser.add_argument(
+        "--link-concurrency",
+        type=int,
+        default=8,
+        help="Concurrent .url checks in --validate (default: 8)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time and call counts per build phase, the slowest folders and archives, "
+        "peak traced memory and output sizes",
+    )
+    parser.add_argument(
+        "--profile-report",
+        help="Also write the --profile report as JSON to this file (implies --profile)",
+    )
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile or args.profile_report:
+        profiler = BuildProfiler()
+        install_profile_hooks(profiler)
+        profiler.start()
+
+    global build_cache
+    if args.incremental or args.watch:
+        build_cache = BuildCache(Path(args.cache))
+        build_cache.load()
+
+    ok = regenerate(args)
+    if profiler is not None:
+        # Only the first build is profiled; --watch rebuilds run without the hooks.
+        profiler.stop()
+        output_path = Path(args.output)
+        outputs = [output_path] + [
+            output_path.parent / name for name in sorted(GENERATED_NAMES) if name != output_path.name
+        ]
+        report = profiler.report(path for path in outputs if path.exists())
+        print_report(report)
+        if args.profile_report:
+            write_report(report, Path(args.profile_report))
+            print(f"Wrote profile report to {args.profile_report}")
+    if args.watch:
+        watch(args)
+    elif not ok:
         sys.exit(1)
 
 
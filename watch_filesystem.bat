@@ -0,0 +1,8 @@
+@echo off
+setlocal
+pushd "%~dp0"
+
+rem Regenerate public/filesystem/filesystem.json whenever public/filesystem changes
+python tools\update_filesystem.py --watch
+
+popd